@@ -0,0 +1,242 @@
+# api.py
+"""Endpoint JSON không qua LLM (Metabase, UI): cùng logic với tools/, kèm ETag/Cache-Control,
+nén gzip/brotli và cache trong tiến trình."""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import SessionLocal, chroma_index, collection_overview
+from monitoring import API_CACHE
+from neighbors import graph_path
+from title_index import AUTOCOMPLETE_LIMIT, PREFIX_TOP_K, autocomplete
+from tools.quote_search import search_quote
+from tools.recommend import similar_movies
+from tools.trending import fetch_trending
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn → chỉ nén gzip
+    brotli = None
+
+logger = logging.getLogger("movies_chatbot.api")
+
+# === CẤU HÌNH ===
+API_CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", "300"))  # Cache-Control max-age (giây)
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "1000"))
+DATA_VERSION_TTL_SECONDS = float(os.getenv("DATA_VERSION_TTL_SECONDS", "30"))  # tần suất kiểm tra dữ liệu đổi
+API_DATA_VERSION = os.getenv("API_DATA_VERSION", "")  # tùy chọn: đổi giá trị khi deploy để bỏ cache cũ
+AUTOCOMPLETE_MAX_AGE = int(os.getenv("AUTOCOMPLETE_MAX_AGE", "60"))  # gợi ý đổi khi crawl thêm phim
+MIN_COMPRESS_BYTES = 512
+
+MOVIE_SQL = text("""
+    SELECT id, title, original_title, release_date, vote_average, vote_count, popularity, runtime,
+           overview, tagline, genres, director, "cast", production_companies, spoken_languages,
+           original_language, imdb_id, poster_path
+    FROM movies
+    WHERE id = :mid
+""")
+LIST_FIELDS = ("genres", "cast", "production_companies", "spoken_languages")
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+
+# === DATA VERSION ===
+_version = {"value": None, "checked_at": 0.0}
+_version_lock = threading.Lock()
+
+
+def data_version() -> str:
+    """Phiên bản dữ liệu = hash(id phim lớn nhất, bản index Chroma đang active, số vector, thời điểm build
+    đồ thị láng giềng). Import/crawl, swap index, load_data.py hay neighbors.py đều làm đổi giá trị.
+    Kiểm tra lại tối đa mỗi DATA_VERSION_TTL_SECONDS."""
+    with _version_lock:
+        now = time.time()
+        if _version["value"] and now - _version["checked_at"] < DATA_VERSION_TTL_SECONDS:
+            return _version["value"]
+        db = SessionLocal()
+        try:
+            max_id = db.execute(text("SELECT MAX(id) FROM movies")).scalar()  # dùng index khóa chính
+        finally:
+            db.close()
+        meta = os.path.join(graph_path(), "meta.json")
+        graph_mtime = os.path.getmtime(meta) if os.path.exists(meta) else 0
+        raw = (f"{max_id}:{chroma_index.current_version()}:{collection_overview.count()}:"
+               f"{graph_mtime}:{API_DATA_VERSION}")
+        _version.update(value=hashlib.sha1(raw.encode()).hexdigest()[:12], checked_at=now)
+        return _version["value"]
+
+
+# === CACHE + NÉN ===
+class CachedResponse:
+    """Body JSON đã serialize; bản nén được tạo lần đầu có client yêu cầu rồi dùng lại."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._encoded = {}
+
+    def encode(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            if encoding == "br":
+                self._encoded[encoding] = brotli.compress(self.body, quality=5)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._encoded[encoding]
+
+
+class ResponseCache:
+    """LRU theo (data version, endpoint, tham số); version mới → key mới, entry cũ tự bị đẩy ra."""
+
+    def __init__(self, max_entries=API_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+response_cache = ResponseCache()
+
+
+def choose_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def cached_json(request: Request, endpoint: str, params: dict, producer) -> Response:
+    """ETag tính từ data version + tham số → trả 304 mà không cần tính lại body."""
+    version = data_version()
+    key = f"{version}:{endpoint}?{json.dumps(params, sort_keys=True, ensure_ascii=False)}"
+    etag = f'"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={API_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        API_CACHE.labels(endpoint=endpoint, result="not_modified").inc()
+        return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        API_CACHE.labels(endpoint=endpoint, result="miss").inc()
+        body = json.dumps(producer(), ensure_ascii=False, default=str).encode("utf-8")
+        entry = CachedResponse(body)
+        response_cache.put(key, entry)
+    else:
+        API_CACHE.labels(endpoint=endpoint, result="hit").inc()
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), len(entry.body))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=entry.encode(encoding), media_type="application/json", headers=headers)
+
+
+# === DỮ LIỆU ===
+def get_movie(movie_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        row = db.execute(MOVIE_SQL, {"mid": movie_id}).fetchone()
+    finally:
+        db.close()
+    if row is None:
+        return None
+    movie = row._asdict()
+    for field in LIST_FIELDS:
+        movie[field] = [v.strip() for v in (movie[field] or "").split(",") if v.strip()]
+    return movie
+
+
+# === ROUTES ===
+# Hàm đồng bộ (def) → FastAPI chạy trong threadpool, không chặn event loop khi truy vấn DB/Chroma
+@router.get("/trending")
+def api_trending(request: Request, genre: str = "", limit: int = Query(5, ge=1, le=50)):
+    """Phim hot theo điểm và lượt đánh giá, lọc thể loại tùy chọn."""
+    def producer():
+        try:
+            genre_name, movies = fetch_trending(genre, limit)
+        except SQLAlchemyError:
+            logger.exception("fetch_trending failed")
+            raise HTTPException(status_code=503, detail="Không lấy được phim hot")
+        return {"genre": genre_name, "movies": movies}
+    return cached_json(request, "trending", {"genre": genre, "limit": limit}, producer)
+
+
+@router.get("/similar/{movie_id}")
+def api_similar(request: Request, movie_id: int, limit: int = Query(5, ge=1, le=20)):
+    """Phim tương tự một phim (đồ thị láng giềng tính trước, fallback vector search)."""
+    def producer():
+        movie = get_movie(movie_id)
+        if movie is None:
+            raise HTTPException(status_code=404, detail="Không tìm thấy phim")
+        genres = {g.lower() for g in movie["genres"]}
+        movies = similar_movies([str(movie_id)], genres, n=limit)
+        if isinstance(movies, str):
+            raise HTTPException(status_code=404, detail=movies)
+        return {"movie_id": movie_id, "movies": movies}
+    return cached_json(request, "similar", {"movie_id": movie_id, "limit": limit}, producer)
+
+
+@router.get("/search/quote")
+def api_search_quote(request: Request, q: str = Query(..., min_length=1), limit: int = Query(3, ge=1, le=20),
+                     language: str = "", year_from: Optional[int] = None, year_to: Optional[int] = None):
+    """Tìm phim theo câu thoại (semantic search), lọc ngôn ngữ gốc/khoảng năm tùy chọn."""
+    def producer():
+        return {"query": q, "movies": search_quote(q, n=limit, language=language,
+                                                   year_from=year_from, year_to=year_to)}
+    params = {"q": q.strip(), "limit": limit, "language": language, "year_from": year_from, "year_to": year_to}
+    return cached_json(request, "search_quote", params, producer)
+
+
+@router.get("/movies/{movie_id}")
+def api_movie(request: Request, movie_id: int):
+    """Thông tin chi tiết một phim."""
+    def producer():
+        movie = get_movie(movie_id)
+        if movie is None:
+            raise HTTPException(status_code=404, detail="Không tìm thấy phim")
+        return movie
+    return cached_json(request, "movie", {"movie_id": movie_id}, producer)
+
+
+@router.get("/autocomplete")
+def api_autocomplete(response: Response, q: str = Query(..., min_length=1, max_length=200),
+                     limit: int = Query(AUTOCOMPLETE_LIMIT, ge=1, le=PREFIX_TOP_K)):
+    """Gợi ý tên phim khi gõ (tiền tố + sai chính tả). Index nằm trong RAM, tra cứu < 1ms nên không qua
+    response cache/ETag (mỗi phím gõ là một key mới)."""
+    response.headers["Cache-Control"] = f"public, max-age={AUTOCOMPLETE_MAX_AGE}"
+    return {"query": q, "movies": autocomplete(q, limit)}
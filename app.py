@@ -1,11 +1,26 @@
 # app.py
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from starlette.middleware.base import BaseHTTPMiddleware
-from chatbot import chat_with_bot
+from monitoring import setup_logging, trace_id_var, new_trace_id, HTTP_LATENCY, metrics_payload
+
+setup_logging()
+logger = logging.getLogger("movies_chatbot.http")
+
+from chatbot import achat_with_bot
+from api import router as api_router
+from title_index import warm_index
+from batch import BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BatchError, batch_results_path, parse_items, run_batch
 
 # === Middleware cho phép iframe embedding (Metabase) ===
 class AllowIframeMiddleware(BaseHTTPMiddleware):
@@ -16,6 +31,50 @@ class AllowIframeMiddleware(BaseHTTPMiddleware):
         response.headers["Content-Security-Policy"] = "frame-ancestors *"
         return response
 
+# === Middleware đo latency + gắn trace ID cho mỗi request ===
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        trace_id = request.headers.get("X-Request-ID") or new_trace_id()
+        token = trace_id_var.set(trace_id)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        except Exception:
+            self.observe(request, 500, start)
+            trace_id_var.reset(token)
+            raise
+        response.headers["X-Trace-Id"] = trace_id
+
+        # Body (StreamingResponse như /chat/batch) được gửi SAU khi dispatch trả về → đo latency khi body
+        # gửi xong, và giữ trace ID tới lúc đó để log của các phần tử sau vẫn có trace ID
+        body = response.body_iterator
+
+        async def body_with_metrics():
+            status = 500
+            try:
+                async for chunk in body:
+                    yield chunk
+                status = response.status_code
+            finally:
+                self.observe(request, status, start)
+
+        async def reset_trace_id():
+            trace_id_var.reset(token)
+
+        response.body_iterator = body_with_metrics()
+        # background (hàm async, không qua threadpool) chạy trong cùng context với dispatch, sau khi gửi hết body
+        response.background = BackgroundTask(reset_trace_id)
+        return response
+
+    @staticmethod
+    def observe(request, status, start):
+        elapsed = time.perf_counter() - start
+        # Dùng path template của route để giới hạn số nhãn
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        HTTP_LATENCY.labels(method=request.method, path=path, status=str(status)).observe(elapsed)
+        logger.info("%s %s status=%d duration_ms=%.1f", request.method, request.url.path, status, elapsed * 1000)
+
 # === Khởi tạo app FastAPI ===
 app = FastAPI(title="Movie AI Chatbot (RAG Demo)")
 
@@ -36,6 +95,8 @@ app.add_middleware(
 
 # Thêm middleware cho iframe
 app.add_middleware(AllowIframeMiddleware)
+# Middleware đo latency thêm sau cùng → bọc ngoài cùng
+app.add_middleware(MetricsMiddleware)
 
 # === Gắn thư mục tĩnh và template ===
 app.mount("/static", StaticFiles(directory="ui"), name="static")
@@ -43,6 +104,17 @@ templates = Jinja2Templates(directory="ui")
 
 
 # === ROUTES ===
+# Endpoint JSON không qua LLM: /api/trending, /api/similar/{id}, /api/search/quote, /api/movies/{id},
+# /api/autocomplete
+app.include_router(api_router)
+
+
+@app.on_event("startup")
+def load_title_index():
+    """Nạp index autocomplete từ snapshot ở thread nền → server nhận request ngay."""
+    threading.Thread(target=warm_index, name="title-index-load", daemon=True).start()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render giao diện chatbot"""
@@ -50,14 +122,44 @@ async def home(request: Request):
 
 
 @app.get("/chat")
-async def chat(q: str):
-    """API chat đơn giản cho frontend hoặc Metabase"""
+async def chat(q: str, session_id: Optional[str] = None):
+    """API chat đơn giản cho frontend hoặc Metabase (session_id để nhớ ngữ cảnh hội thoại)"""
     if not q.strip():
         return {"response": "Vui lòng nhập câu hỏi!"}
-    response = chat_with_bot(q)
+    response = await achat_with_bot(q, session_id=session_id)
     return {"response": response}
 
 
+@app.post("/chat/batch")
+async def chat_batch(
+    request: Request,
+    batch_id: Optional[str] = None,
+    concurrency: int = Query(BATCH_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY),
+):
+    """Batch câu hỏi: body JSONL ({"id", "question"} mỗi dòng), trả về JSONL theo thứ tự hoàn thành.
+    Gửi lại cùng batch_id (header X-Batch-Id của lần trước) để resume: câu đã xong được trả lại ngay."""
+    body = (await request.body()).decode("utf-8")
+    try:
+        items = parse_items(body.splitlines())
+        batch_id = batch_id or uuid.uuid4().hex
+        results_path = batch_results_path(batch_id)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        async for record in run_batch(items, results_path, concurrency):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id})
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (latency từng giai đoạn, token LLM)"""
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+
 # === Kiểm tra chạy standalone ===
 if __name__ == "__main__":
     import uvicorn
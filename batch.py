@@ -0,0 +1,190 @@
+# batch.py
+"""Chạy hàng loạt câu hỏi qua agent (bộ đánh giá offline, hỏi đáp số lượng lớn).
+
+Input JSONL, mỗi dòng: {"id": "q1", "question": "..."} (id tùy chọn, mặc định là số dòng).
+Output JSONL, mỗi dòng một kết quả (theo thứ tự hoàn thành) kèm latency và token.
+File output đồng thời là checkpoint: chạy lại cùng file → chỉ chạy các câu chưa xong.
+
+Ví dụ:
+    python batch.py eval.jsonl --output results.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+from monitoring import setup_logging
+from chatbot import achat_with_usage
+from sessions import SharedToolCache
+
+# === CẤU HÌNH ===
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+BATCH_DIR = os.getenv("BATCH_DIR", "batches")  # checkpoint của POST /chat/batch theo batch_id
+
+BATCH_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_items(lines):
+    """Các dòng JSONL → [{"id", "question"}]; lỗi định dạng báo kèm số dòng."""
+    items, seen = [], set()
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchError(f"Dòng {lineno}: JSON không hợp lệ ({e.msg})")
+        if isinstance(data, str):
+            data = {"question": data}
+        question = (data.get("question") or data.get("q")) if isinstance(data, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            raise BatchError(f"Dòng {lineno}: thiếu trường \"question\"")
+        item_id = str(data.get("id", lineno))
+        if item_id in seen:
+            raise BatchError(f"Dòng {lineno}: id \"{item_id}\" bị trùng")
+        seen.add(item_id)
+        items.append({"id": item_id, "question": question.strip()})
+    if len(items) > BATCH_MAX_ITEMS:
+        raise BatchError(f"Tối đa {BATCH_MAX_ITEMS} câu hỏi mỗi batch (nhận {len(items)})")
+    return items
+
+
+def question_key(question: str) -> str:
+    """Khóa gộp câu hỏi trùng: bỏ khác biệt hoa/thường, khoảng trắng, dấu câu cuối."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def load_checkpoint(path):
+    """id → kết quả đã ghi (bản ghi sau cùng thắng, vd. lần chạy lại sau lỗi)."""
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # dòng ghi dở khi bị ngắt
+                done[record["id"]] = record
+    return done
+
+
+async def run_batch(items, results_path=None, concurrency=BATCH_CONCURRENCY):
+    """Async generator: trả từng kết quả ngay khi xong.
+
+    - Câu đã có kết quả "ok" trong results_path được trả lại ngay (resumed=True), không chạy lại.
+    - Câu hỏi trùng (sau question_key) chỉ chạy một lần; bản sao nhận cùng câu trả lời (duplicate_of).
+    - Mọi câu dùng chung một SharedToolCache: cùng tool + input chỉ truy vấn một lần trong cả batch.
+    """
+    done = load_checkpoint(results_path)
+    pending = []
+    for item in items:
+        record = done.get(item["id"])
+        if record and record.get("status") == "ok":
+            yield {**record, "resumed": True}
+        else:
+            pending.append(item)
+
+    groups = OrderedDict()
+    for item in pending:
+        groups.setdefault(question_key(item["question"]), []).append(item)
+
+    tool_cache = SharedToolCache()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_group(group):
+        async with semaphore:
+            start = time.perf_counter()
+            answer, info = await achat_with_usage(group[0]["question"], tool_cache=tool_cache)
+            return group, answer, info, time.perf_counter() - start
+
+    tasks = [asyncio.create_task(run_group(group)) for group in groups.values()]
+    out = open(results_path, "a", encoding="utf-8") if results_path else None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            group, answer, info, elapsed = await next_done
+            for n, item in enumerate(group):
+                record = {
+                    "id": item["id"],
+                    "question": item["question"],
+                    "answer": answer,
+                    "status": info["status"],
+                    "latency_ms": round(elapsed * 1000, 1),
+                    # Bản sao không tốn thêm token
+                    "llm_calls": info["llm_calls"] if n == 0 else 0,
+                    "prompt_tokens": info["prompt_tokens"] if n == 0 else 0,
+                    "completion_tokens": info["completion_tokens"] if n == 0 else 0,
+                }
+                if n > 0:
+                    record["duplicate_of"] = group[0]["id"]
+                if out:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                yield record
+    finally:
+        # Client ngắt kết nối / generator bị đóng sớm → hủy các câu còn lại (đã xong thì đã có checkpoint)
+        for task in tasks:
+            task.cancel()
+        if out:
+            out.close()
+
+
+def batch_results_path(batch_id: str) -> str:
+    if not BATCH_ID_PATTERN.match(batch_id):
+        raise BatchError("batch_id chỉ gồm chữ, số, '-' và '_' (tối đa 64 ký tự)")
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    return os.path.join(BATCH_DIR, f"{batch_id}.jsonl")
+
+
+async def run_file(input_path, output_path, concurrency, fresh=False):
+    with open(input_path, encoding="utf-8") as f:
+        items = parse_items(f)
+    if fresh and os.path.exists(output_path):
+        os.remove(output_path)
+
+    start = time.perf_counter()
+    stats = {"total": len(items), "resumed": 0, "ok": 0, "failed": 0, "duplicates": 0,
+             "prompt_tokens": 0, "completion_tokens": 0}
+    async for record in run_batch(items, output_path, concurrency):
+        if record.get("resumed"):
+            stats["resumed"] += 1
+            continue
+        stats["ok" if record["status"] == "ok" else "failed"] += 1
+        stats["duplicates"] += "duplicate_of" in record
+        stats["prompt_tokens"] += record["prompt_tokens"]
+        stats["completion_tokens"] += record["completion_tokens"]
+        finished = stats["resumed"] + stats["ok"] + stats["failed"]
+        print(f"[{finished}/{stats['total']}] {record['id']} {record['status']} {record['latency_ms']}ms",
+              file=sys.stderr)
+    stats["wall_seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy batch câu hỏi JSONL qua chatbot")
+    parser.add_argument("input", help="File JSONL câu hỏi")
+    parser.add_argument("--output", required=True, help="File JSONL kết quả (cũng là checkpoint để resume)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--fresh", action="store_true", help="Bỏ kết quả cũ trong --output, chạy lại từ đầu")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        stats = asyncio.run(run_file(args.input, args.output, args.concurrency, args.fresh))
+    except BatchError as e:
+        parser.error(str(e))
+    print(json.dumps(stats, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
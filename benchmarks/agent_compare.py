@@ -0,0 +1,69 @@
+# benchmarks/agent_compare.py
+"""So sánh agent ReAct và agent function calling (AGENT_MODE=tools) bằng stub LLM:
+số LLM call trung bình và wall time mỗi câu hỏi.
+
+Ví dụ:
+    python -m benchmarks.agent_compare --llm-latency-ms 800 --output agents.json
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import apply_offline_env, ensure_dataset, summarize, write_report
+from benchmarks.load_test import QUESTIONS
+
+
+async def run_mode(mode, rounds, warmup=1):
+    from chatbot import build_agent_executor
+    from monitoring import MetricsCallbackHandler
+
+    executor = build_agent_executor(mode)
+    # Vòng khởi động bỏ đi: chế độ chạy trước không phải gánh import lười, cache, kết nối DB/Chroma
+    for _ in range(warmup):
+        for question in QUESTIONS:
+            await executor.ainvoke({"input": question, "history": "(chưa có)"})
+    wall, llm_calls, tokens = [], [], []
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            handler = MetricsCallbackHandler()
+            start = time.perf_counter()
+            await executor.ainvoke({"input": question, "history": "(chưa có)"}, config={"callbacks": [handler]})
+            wall.append(time.perf_counter() - start)
+            llm_calls.append(handler.llm_calls)
+            tokens.append(handler.prompt_tokens + handler.completion_tokens)
+    return {
+        "queries": len(wall),
+        "avg_llm_calls": round(sum(llm_calls) / len(llm_calls), 3),
+        "avg_tokens": round(sum(tokens) / len(tokens), 1),
+        "wall": summarize(wall),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh ReAct vs function-calling agent")
+    parser.add_argument("--workdir", default="bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Số vòng chạy thử (không tính) mỗi chế độ")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="Độ trễ giả lập mỗi LLM call")
+    parser.add_argument("--output", help="File JSON kết quả (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    apply_offline_env(args.workdir)
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    ensure_dataset(args.workdir, args.rows)
+    if not os.path.isdir(os.environ["CHROMA_PATH"]):
+        from load_data import load_to_chroma
+        load_to_chroma()
+
+    results = {mode: asyncio.run(run_mode(mode, args.rounds, args.warmup)) for mode in ("react", "tools")}
+    write_report({
+        "benchmark": "agent_compare",
+        "params": {"rows": args.rows, "rounds": args.rounds, "warmup": args.warmup, "llm_latency_ms": args.llm_latency_ms},
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_autocomplete.py
+"""Autocomplete tên phim (title_index.py): thời gian build/nạp snapshot, latency tra cứu theo loại truy vấn
+(tiền tố ngắn, tiền tố dài, gõ sai) và tỉ lệ tìm lại đúng phim khi gõ sai.
+
+Ví dụ:
+    python -m benchmarks.bench_autocomplete --rows 150000 --queries 500 --output autocomplete.json
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.common import apply_offline_env, ensure_dataset, summarize, write_report
+
+
+def typo(text, rng):
+    """Một lỗi gõ ngẫu nhiên: đổi chỗ, bỏ hoặc lặp một ký tự."""
+    i = rng.randrange(len(text) - 1)
+    kind = rng.choice(("swap", "drop", "double"))
+    if kind == "swap":
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if kind == "drop":
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i] + text[i:]
+
+
+def measure(index, queries, limit=10):
+    samples, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, limit))
+        samples.append(time.perf_counter() - start)
+    return summarize(samples), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark autocomplete tên phim")
+    parser.add_argument("--workdir", default="bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--output", help="File JSON kết quả (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    apply_offline_env(args.workdir)
+    ensure_dataset(args.workdir, args.rows, args.seed)
+    from title_index import TITLE_INDEX_PATH, build_snapshot, load_snapshot
+
+    start = time.perf_counter()
+    count = build_snapshot(TITLE_INDEX_PATH, min_votes=0)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    index = load_snapshot(TITLE_INDEX_PATH)
+    load_seconds = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    sample = rng.sample(range(len(index)), min(args.queries, len(index)))
+    titles = [(index.ids[e], index.titles[e]) for e in sample if len(index.titles[e]) >= 6]
+    workloads = {
+        "prefix_2_chars": [t[:2] for _, t in titles],
+        "prefix_6_chars": [t[:6] for _, t in titles],
+        "full_title": [t for _, t in titles],
+        "typo": [typo(t, rng) for _, t in titles],
+    }
+    latency, found = {}, {}
+    for name, queries in workloads.items():
+        latency[name], results = measure(index, queries)
+        if name in ("full_title", "typo"):
+            found[name] = {
+                f"top{k}": round(sum(mid in [r["id"] for r in res[:k]] for (mid, _), res in zip(titles, results))
+                                 / len(titles), 4)
+                for k in (1, 10)
+            }
+
+    write_report({
+        "benchmark": "autocomplete",
+        "params": {"rows": args.rows, "queries": len(titles)},
+        "results": {
+            "titles": count,
+            "prefix_keys": len(index.keys),
+            "precomputed_prefixes": len(index.top),
+            "snapshot_bytes": os.path.getsize(TITLE_INDEX_PATH),
+            "build_snapshot_seconds": round(build_seconds, 2),
+            "load_snapshot_seconds": round(load_seconds, 2),
+            "latency": latency,
+            "found": found,
+        },
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_partitions.py
+"""So sánh collection overview không chia với chia partition (language/decade/hash):
+latency query (có/không lọc năm, ngôn ngữ) và recall@10 so với tìm kiếm vét cạn.
+
+Ví dụ:
+    python -m benchmarks.bench_partitions --rows 50000 --iterations 100 --output partitions.json
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.common import apply_offline_env, ensure_dataset, time_calls, write_report
+
+KEYS = ("none", "language", "decade", "hash")
+FILTERS = {
+    "no_filter": {},
+    "year_2010_plus": {"year_from": 2010},
+    "language_en": {"language": "en"},
+}
+
+
+def build(workdir, key):
+    """Mỗi khóa chia một PersistentClient riêng; đã build thì dùng lại."""
+    from chromadb import PersistentClient
+    from chroma_index import COLLECTION_NAMES
+    from load_data import load_to_chroma
+    from partitions import open_partitioned
+
+    client = PersistentClient(path=os.path.join(workdir, "partitions", key))
+    target = tuple(open_partitioned(client, name, key) for name in COLLECTION_NAMES)
+    elapsed = None
+    if not target[0].count():
+        start = time.perf_counter()
+        load_to_chroma(target)
+        elapsed = round(time.perf_counter() - start, 2)
+    # Đo như app phục vụ một bản đã build (chroma_index.py): danh sách partition và số phần tử được cache
+    return open_partitioned(client, COLLECTION_NAMES[0], key, frozen=True), elapsed
+
+
+def recall_at_k(found, matrix, positions, queries, k=10):
+    """So với vét cạn (L2 bình phương, metric mặc định của Chroma). Kết quả có khoảng cách bằng
+    khoảng cách thứ k vẫn tính là đúng (hash encoder tạo nhiều vector cách đều nhau)."""
+    dists = (queries ** 2).sum(1)[:, None] - 2 * queries @ matrix.T + (matrix ** 2).sum(1)[None, :]
+    kth = np.partition(dists, k - 1, axis=1)[:, k - 1]
+    hits = [sum(dists[q, positions[i]] <= kth[q] + 1e-4 for i in row) for q, row in enumerate(found)]
+    return float(np.mean(hits)) / k
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark collection Chroma chia partition")
+    parser.add_argument("--workdir", default="bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100, help="Số truy vấn dùng tính recall")
+    parser.add_argument("--output", help="File JSON kết quả (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    apply_offline_env(args.workdir)
+    ensure_dataset(args.workdir, args.rows, args.seed)
+    from partitions import metadata_where
+
+    rng = np.random.default_rng(args.seed)
+    results, matrix = {}, None
+    for key in KEYS:
+        coll, build_seconds = build(args.workdir, key)
+        if matrix is None:
+            page = coll.get(include=["embeddings"])
+            matrix = np.asarray(page["embeddings"], dtype=np.float32)
+            positions = {mid: i for i, mid in enumerate(page["ids"])}
+            # Truy vấn = vector có sẵn + nhiễu nhỏ → không trùng khít vector nào
+            queries = matrix[rng.choice(len(matrix), args.queries, replace=False)]
+            queries = queries + rng.normal(0, 0.005, queries.shape).astype(np.float32)
+
+        found = coll.query(query_embeddings=queries.tolist(), n_results=10, include=[])["ids"]
+        recall = recall_at_k(found, matrix, positions, queries)
+        latency = {}
+        for name, params in FILTERS.items():
+            where = metadata_where(**params)
+            query = queries[:1].tolist()
+            latency[name] = {
+                "partitions_searched": len(coll.select(where)),
+                **time_calls(lambda: coll.query(query_embeddings=query, n_results=10, where=where),
+                             args.iterations),
+            }
+        results[key] = {
+            "partitions": len(coll.parts),
+            "build_seconds": build_seconds,
+            "recall_at_10": round(float(recall), 4),
+            "latency": latency,
+        }
+
+    write_report({
+        "benchmark": "partitions",
+        "params": {"rows": args.rows, "iterations": args.iterations, "queries": args.queries},
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/common.py
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def offline_env(workdir):
+    """Biến môi trường để app chạy hoàn toàn offline (stub LLM, hash encoder, SQLite)."""
+    workdir = os.path.abspath(workdir)
+    return {
+        "LLM_BACKEND": "fake",
+        "EMBEDDING_BACKEND": "hash",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'movies.db')}",
+        "CHROMA_PATH": os.path.join(workdir, "chroma_db"),
+        "NEIGHBORS_PATH": os.path.join(workdir, "neighbors"),
+        "TITLE_INDEX_PATH": os.path.join(workdir, "title_index.json.gz"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "ANONYMIZED_TELEMETRY": "False",
+    }
+
+
+def apply_offline_env(workdir):
+    """Phải gọi TRƯỚC khi import config/chatbot."""
+    os.environ.update(offline_env(workdir))
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def ensure_dataset(workdir, rows, seed=42, regenerate=False):
+    """Sinh SQLite giả lập nếu chưa có. Trả về True nếu vừa sinh mới."""
+    from benchmarks.synthetic_data import generate
+
+    db_path = os.path.join(os.path.abspath(workdir), "movies.db")
+    if os.path.exists(db_path) and not regenerate:
+        return False
+    generate(f"sqlite:///{db_path}", rows=rows, seed=seed)
+    return True
+
+
+def summarize(samples_s):
+    """Thống kê latency (ms) từ danh sách thời gian (giây)."""
+    if not samples_s:
+        return {"count": 0}
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def time_calls(fn, iterations, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(report, output=None):
+    """Ghi báo cáo JSON (ra file hoặc stdout) để diff giữa các commit."""
+    report = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **report}
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return report
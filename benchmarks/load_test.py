@@ -0,0 +1,110 @@
+# benchmarks/load_test.py
+"""Load test HTTP cho /chat: throughput và latency p50/p95/p99, xuất JSON.
+
+Mặc định tự khởi động app (stub LLM, SQLite) trên cổng riêng; dùng --url để bắn vào server có sẵn.
+
+Ví dụ:
+    python -m benchmarks.load_test --requests 500 --concurrency 16 --output load.json
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import REPO_ROOT, ensure_dataset, offline_env, summarize, write_report
+
+QUESTIONS = [
+    'Phim nào có câu thoại "Inception"?',
+    'Gợi ý phim giống "Inception" và "Interstellar"',
+    "Phim nào đang hot?",
+    'Phim đang hot và gợi ý phim giống "Parasite"',
+    "Xin chào!",
+]
+
+
+def wait_until_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/metrics", timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.5)
+    raise RuntimeError(f"Server {url} không sẵn sàng sau {timeout}s")
+
+
+def start_server(workdir, rows, port):
+    env = {**os.environ, **offline_env(workdir)}
+    ensure_dataset(workdir, rows)
+    if not os.path.isdir(env["CHROMA_PATH"]):
+        subprocess.run([sys.executable, "load_data.py"], cwd=REPO_ROOT, env=env, check=True)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+    return server
+
+
+def one_request(url, question):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(f"{url}/chat?q={urllib.parse.quote(question)}", timeout=300) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except (urllib.error.URLError, ConnectionError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_load(url, total, concurrency):
+    questions = list(itertools.islice(itertools.cycle(QUESTIONS), total))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda q: one_request(url, q), questions))
+    wall = time.perf_counter() - start
+    latencies = [lat for lat, ok in results if ok]
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in results if not ok),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /chat")
+    parser.add_argument("--url", help="Server có sẵn (mặc định tự khởi động app offline)")
+    parser.add_argument("--workdir", default="bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="File JSON kết quả (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server = start_server(args.workdir, args.rows, args.port)
+        url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(url)
+        result = run_load(url, args.requests, args.concurrency)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    write_report({"benchmark": "load_chat", "params": {"url": url, "rows": args.rows}, "results": result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/run_benchmarks.py
+"""Microbenchmark offline: load_to_chroma, từng tool trong tools/, encoder và đồ thị láng giềng tính trước.
+
+Ví dụ:
+    python -m benchmarks.run_benchmarks --rows 20000 --iterations 50 --output bench.json
+"""
+import argparse
+import time
+
+from benchmarks.common import apply_offline_env, ensure_dataset, time_calls, write_report
+
+# Mỗi tool trong tools/ một hoặc nhiều input (tên case → input)
+TOOL_INPUTS = {
+    "find_movie_by_quote": {"default": "Inception"},
+    "recommend_movie_from_likes": {"default": "Inception, Interstellar"},
+    "get_trending_movies": {"default": "", "genre": "hành động"},
+    "find_movies_by_person": {"default": "Christopher Nolan"},
+    "filter_movies": {"default": "genre=hành động; year_from=2010; person=Christopher Nolan"},
+}
+# Case cần PostgreSQL (full-text search, cột text[]) → bỏ qua trên SQLite giả lập
+POSTGRES_ONLY = {
+    ("get_trending_movies", "genre"),
+    ("find_movies_by_person", "default"),
+    ("filter_movies", "default"),
+}
+
+ENCODER_TEXT = "A team of explorers travel through a wormhole in space in an attempt to ensure humanity's survival."
+
+
+def bench_load_to_chroma():
+    from load_data import load_to_chroma
+
+    start = time.perf_counter()
+    load_to_chroma()
+    return {"seconds": round(time.perf_counter() - start, 3)}
+
+
+def bench_encoder(iterations):
+    from config import embedding_model
+
+    batch = [f"{ENCODER_TEXT} #{i}" for i in range(256)]
+    return {
+        "single": time_calls(lambda: embedding_model.encode(ENCODER_TEXT), iterations),
+        "batch_256": time_calls(lambda: embedding_model.encode(batch, batch_size=64), max(1, iterations // 10)),
+    }
+
+
+def bench_neighbor_graph(iterations):
+    """Thời gian build đồ thị top-K và bước lấy ứng viên gợi ý: tra đồ thị vs ANN trực tiếp."""
+    from neighbors import build_neighbor_graph
+    from tools.recommend import graph_candidates, live_candidates
+
+    build_seconds = build_neighbor_graph()
+    liked_ids = ["1", "2"]  # Inception, Interstellar (ANCHOR_MOVIES)
+    return {
+        "build_seconds": round(build_seconds, 3),
+        "graph_lookup": time_calls(lambda: graph_candidates(liked_ids), iterations),
+        "live_ann": time_calls(lambda: live_candidates(liked_ids), iterations),
+    }
+
+
+def bench_tools(iterations):
+    from chatbot import tools
+    from config import engine
+
+    postgres = engine.dialect.name == "postgresql"
+    results = {}
+    for t in tools:
+        cases = TOOL_INPUTS.get(t.name)
+        if cases is None:
+            print(f"⚠️ Bỏ qua {t.name}: chưa có input trong TOOL_INPUTS")
+            continue
+        for case, tool_input in cases.items():
+            name = t.name if case == "default" else f"{t.name}[{case}]"
+            if (t.name, case) in POSTGRES_ONLY and not postgres:
+                print(f"⚠️ Bỏ qua {name}: cần PostgreSQL (full-text search/cột text[]), "
+                      "chạy benchmarks/bench_people_search.py với DATABASE_URL PostgreSQL")
+                results[name] = {"skipped": "requires PostgreSQL"}
+                continue
+            results[name] = time_calls(lambda: t.invoke(tool_input), iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark offline cho movies-chatbot")
+    parser.add_argument("--workdir", default="bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--regenerate", action="store_true", help="Sinh lại dữ liệu giả lập")
+    parser.add_argument("--skip-load", action="store_true", help="Bỏ qua benchmark load_to_chroma")
+    parser.add_argument("--output", help="File JSON kết quả (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    apply_offline_env(args.workdir)
+    ensure_dataset(args.workdir, args.rows, seed=args.seed, regenerate=args.regenerate)
+
+    results = {}
+    if not args.skip_load:
+        results["load_to_chroma"] = bench_load_to_chroma()
+    results["encoder"] = bench_encoder(args.iterations)
+    results["neighbor_graph"] = bench_neighbor_graph(args.iterations)
+    results["tools"] = bench_tools(args.iterations)
+
+    write_report({
+        "benchmark": "micro",
+        "params": {"rows": args.rows, "seed": args.seed, "iterations": args.iterations},
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# benchmarks/stubs.py
+"""Stub LLM và encoder chạy offline, kết quả tất định — dùng cho benchmark/load test."""
+import os
+import re
+import time
+import zlib
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# (từ khóa trong câu hỏi, tool tương ứng) — thứ tự cũng là thứ tự gọi tool
+TOOL_SCRIPTS = [
+    (("câu thoại", "quote", "thoại"), "find_movie_by_quote"),
+    (("gợi ý", "giống", "tương tự", "thích"), "recommend_movie_from_likes"),
+    (("hot", "trending", "nổi bật"), "get_trending_movies"),
+    (("đạo diễn", "diễn viên", "đóng"), "find_movies_by_person"),
+    (("thể loại", "lọc"), "filter_movies"),
+]
+
+
+def approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def filter_arg(question: str, quoted) -> str:
+    """Input đúng định dạng "key=value; ..." của filter_movies (tools/movie_filter.parse_filters):
+    thể loại nhận ra trong câu hỏi, "sau/từ <năm>" → year_from, tên trong ngoặc kép → person."""
+    from text_utils import fold_accents
+    from tools.movie_filter import GENRE_ALIASES, TMDB_GENRES
+
+    if quoted and "=" in quoted[0]:
+        return quoted[0]
+    folded = fold_accents(question)
+    parts = []
+    names = sorted(set(GENRE_ALIASES) | TMDB_GENRES, key=len, reverse=True)  # "khoa hoc vien tuong" trước "vien tuong"
+    genre = next((name for name in names if re.search(rf"\b{re.escape(name)}\b", folded)), None)
+    if genre:
+        parts.append(f"genre={genre}")
+    year = re.search(r"(?:sau|tu)\s+(?:nam\s+)?(\d{4})", folded)
+    if year:
+        parts.append(f"year_from={year.group(1)}")
+    if quoted:
+        parts.append(f"person={quoted[0]}")
+    return "; ".join(parts)
+
+
+def plan_tools(question: str):
+    """Trả về danh sách (tool, input) mà stub sẽ gọi cho câu hỏi."""
+    q = question.lower()
+    quoted = re.findall(r'"([^"]+)"', question)
+    plan = []
+    for keywords, tool in TOOL_SCRIPTS:
+        if any(k in q for k in keywords):
+            if tool == "filter_movies":
+                arg = filter_arg(question, quoted)
+            elif tool == "find_movie_by_quote":
+                arg = quoted[0] if quoted else question
+            elif tool in ("recommend_movie_from_likes", "find_movies_by_person"):
+                arg = ", ".join(quoted) if quoted else question
+            else:
+                arg = ""
+            plan.append((tool, arg))
+    return plan
+
+
+class ScriptedChatModel(BaseChatModel):
+    """LLM giả lập sinh ReAct trace theo kịch bản (Thought/Action/Observation → Final Answer).
+
+    Khi được bind_tools(), chuyển sang chế độ function calling: gọi TẤT CẢ tool cần thiết
+    trong một lượt (tool_calls), lượt sau tổng hợp từ các ToolMessage.
+
+    Độ trễ giả lập = latency_ms + ms_per_1k_prompt_tokens * (số token prompt / 1000),
+    để phản ánh chi phí prompt dài như LLM thật.
+    """
+
+    latency_ms: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+    ms_per_1k_prompt_tokens: float = float(os.getenv("FAKE_LLM_MS_PER_1K_TOKENS", "0"))
+    model_name: str = "fake-react"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def _respond(self, prompt: str) -> str:
+        if "Question:" not in prompt:
+            # Prompt không phải ReAct (vd. tóm tắt lịch sử) → trả về đoạn cuối
+            return prompt.strip()[-200:]
+        # Chỉ xét phần sau câu hỏi cuối cùng (scratchpad của lượt hiện tại)
+        parts = prompt.rsplit("Question:", 1)
+        tail = parts[-1]
+        question = tail.strip().splitlines()[0] if tail.strip() else ""
+        plan = plan_tools(question)
+        done = tail.count("Observation:")
+        if done < len(plan):
+            tool, arg = plan[done]
+            return f"Thought: Tôi cần dùng công cụ {tool}\nAction: {tool}\nAction Input: {arg}"
+        observations = re.findall(r"Observation:\s*(.*?)(?:\nThought:|$)", tail, flags=re.S)
+        summary = " | ".join(o.strip() for o in observations) or "Tôi chưa thấy phim phù hợp, bạn mô tả thêm được không?"
+        return f"Thought: Tôi đã có đủ thông tin để trả lời\nFinal Answer: {summary}"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _respond_tool_calls(self, messages: List[BaseMessage], tools: List[dict]) -> AIMessage:
+        question = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        observations = [str(m.content) for m in messages if isinstance(m, ToolMessage)]
+        plan = plan_tools(question)
+        if plan and not observations:
+            # Tên tham số đầu tiên trong schema của từng tool
+            arg_names = {
+                t["function"]["name"]: next(iter(t["function"]["parameters"].get("properties", {})), "__arg1")
+                for t in tools
+            }
+            tool_calls = [
+                {"name": tool, "args": {arg_names.get(tool, "__arg1"): arg}, "id": f"call_{i}"}
+                for i, (tool, arg) in enumerate(plan)
+            ]
+            return AIMessage(content="", tool_calls=tool_calls)
+        summary = " | ".join(observations) or "Tôi chưa thấy phim phù hợp, bạn mô tả thêm được không?"
+        return AIMessage(content=summary)
+
+    def _simulate_latency(self, prompt_tokens: int):
+        delay_ms = self.latency_ms + self.ms_per_1k_prompt_tokens * prompt_tokens / 1000
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if kwargs.get("tools"):
+            message = self._respond_tool_calls(messages, kwargs["tools"])
+        else:
+            message = AIMessage(content=self._respond(prompt))
+        prompt_tokens = approx_tokens(prompt)
+        completion_tokens = approx_tokens(str(message.content) + str(message.tool_calls))
+        self._simulate_latency(prompt_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": usage, "model_name": self.model_name},
+        )
+
+
+class HashEncoder:
+    """Encoder tất định dạng feature hashing, cùng API encode() với SentenceTransformer."""
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", (text or "").lower()):
+            h = zlib.crc32(token.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        return np.stack([self._encode_one(s) for s in sentences]) if sentences else np.zeros((0, self.dim), dtype=np.float32)
@@ -0,0 +1,143 @@
+# benchmarks/synthetic_data.py
+"""Sinh bảng `movies` giả lập (cùng schema với database/data_import.py) cho benchmark.
+
+Ví dụ:
+    python -m benchmarks.synthetic_data --rows 1000000 --database-url sqlite:///bench/movies.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date
+
+from faker import Faker
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from database.array_columns import add_array_columns, backfill_arrays, create_array_indexes
+from database.postgres import fake_movie
+
+CHUNK_SIZE = 10000
+
+CREATE_MOVIES_SQL = """
+CREATE TABLE movies (
+    "id" BIGINT PRIMARY KEY,
+    "title" TEXT,
+    "vote_average" FLOAT,
+    "vote_count" FLOAT,
+    "status" VARCHAR(100),
+    "release_date" DATE,
+    "revenue" NUMERIC(18, 2),
+    "runtime" FLOAT,
+    "budget" NUMERIC(18, 2),
+    "imdb_id" VARCHAR(20),
+    "original_language" VARCHAR(10),
+    "original_title" TEXT,
+    "overview" TEXT,
+    "popularity" FLOAT,
+    "tagline" TEXT,
+    "genres" TEXT,
+    "production_companies" TEXT,
+    "production_countries" TEXT,
+    "spoken_languages" TEXT,
+    "cast" TEXT,
+    "director" TEXT,
+    "director_of_photography" TEXT,
+    "writers" TEXT,
+    "producers" TEXT,
+    "music_composer" TEXT,
+    "imdb_rating" FLOAT,
+    "imdb_votes" BIGINT,
+    "poster_path" TEXT
+)
+"""
+
+INSERT_MOVIE_SQL = """
+INSERT INTO movies (
+    "id", "title", "vote_average", "vote_count", "status", "release_date", "overview", "popularity",
+    "tagline", "genres", "cast", "director", "original_language", "original_title"
+) VALUES (
+    :id, :title, :vote_average, :vote_count, 'Released', :release_date, :overview, :popularity,
+    :tagline, :genres, :cast, :director, :original_language, :title
+)
+"""
+
+# Phim "neo" cố định để kịch bản benchmark (quote/gợi ý/trending) luôn có kết quả
+ANCHOR_MOVIES = [
+    ("Inception", date(2010, 7, 15), "Christopher Nolan", "Action, Sci-Fi, Thriller",
+     "A thief who steals corporate secrets through dream-sharing technology is given the inverse task of planting an idea."),
+    ("Interstellar", date(2014, 11, 5), "Christopher Nolan", "Adventure, Drama, Sci-Fi",
+     "A team of explorers travel through a wormhole in space in an attempt to ensure humanity's survival."),
+    ("The Dark Knight", date(2008, 7, 16), "Christopher Nolan", "Action, Crime, Drama",
+     "Batman raises the stakes in his war on crime and faces the Joker, a criminal mastermind."),
+    ("Parasite", date(2019, 5, 30), "Bong Joon-ho", "Comedy, Thriller, Drama",
+     "All unemployed, Ki-taek's family takes peculiar interest in the wealthy and glamorous Parks."),
+    ("Spirited Away", date(2001, 7, 20), "Hayao Miyazaki", "Animation, Family, Fantasy",
+     "A young girl wanders into a world ruled by gods, witches and spirits where humans are changed into beasts."),
+]
+
+LANGUAGES = ["en", "en", "en", "fr", "ja", "ko", "vi", "es"]
+
+
+def anchor_rows():
+    for i, (title, released, director, genres, overview) in enumerate(ANCHOR_MOVIES, start=1):
+        yield {
+            "id": i, "title": title, "vote_average": 8.5 + i / 10, "vote_count": 30000 - i * 1000,
+            "release_date": released, "overview": overview, "popularity": 200.0 - i,
+            "tagline": None, "genres": genres, "cast": "Leonardo DiCaprio, Christian Bale",
+            "director": director, "original_language": "en",
+        }
+
+
+def synthetic_rows(rows, seed):
+    fake = Faker()
+    Faker.seed(seed)
+    rng = random.Random(seed)
+    for movie_id in range(len(ANCHOR_MOVIES) + 1, rows + 1):
+        title, genres, cast, director, release_date, overview, tagline, vote_average, vote_count = fake_movie(fake, rng)
+        yield {
+            "id": movie_id, "title": title, "vote_average": vote_average, "vote_count": vote_count,
+            "release_date": release_date, "overview": overview, "popularity": round(rng.uniform(0, 100), 3),
+            "tagline": tagline, "genres": ", ".join(genres), "cast": ", ".join(cast),
+            "director": director, "original_language": rng.choice(LANGUAGES),
+        }
+
+
+def generate(database_url, rows=10000, seed=42):
+    """Tạo lại bảng `movies` với `rows` phim (tất định theo seed)."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database:
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    engine = create_engine(database_url)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS movies"))
+        conn.execute(text(CREATE_MOVIES_SQL))
+        conn.execute(text(INSERT_MOVIE_SQL), list(anchor_rows()))
+        batch = []
+        for row in synthetic_rows(rows, seed):
+            batch.append(row)
+            if len(batch) >= CHUNK_SIZE:
+                conn.execute(text(INSERT_MOVIE_SQL), batch)
+                batch = []
+        if batch:
+            conn.execute(text(INSERT_MOVIE_SQL), batch)
+        if url.get_backend_name() == "postgresql":
+            # Cột text[] + GIN như database/array_columns.py (SQLite không có kiểu mảng)
+            cur = conn.connection.cursor()
+            add_array_columns(cur)
+            backfill_arrays(cur, batch_size=rows)
+            create_array_indexes(cur)
+    engine.dispose()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Đã sinh {rows} phim trong {elapsed:.1f}s → {database_url}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu movies giả lập cho benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default="sqlite:///bench/movies.db")
+    args = parser.parse_args()
+    generate(args.database_url, rows=args.rows, seed=args.seed)
@@ -0,0 +1,87 @@
+# benchmarks/token_report.py
+"""Đo token prompt/completion và độ trễ mỗi câu hỏi khi bật/tắt rút gọn output tool (stub LLM).
+
+Độ trễ LLM giả lập tỉ lệ với số token prompt (--ms-per-1k-tokens) để thấy được lợi ích về latency.
+
+Ví dụ:
+    python -m benchmarks.token_report --ms-per-1k-tokens 400 --output tokens.json
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import apply_offline_env, ensure_dataset, summarize, write_report
+from benchmarks.load_test import QUESTIONS
+
+
+def run(mode, compact, rounds, warmup=1):
+    import token_budget
+    from chatbot import build_agent_executor
+    from token_budget import TokenBudgetHandler
+
+    token_budget.COMPACT_TOOL_OUTPUT = compact
+    executor = build_agent_executor(mode)
+    # Vòng khởi động bỏ đi: import lười, cache, kết nối DB/Chroma không được tính vào chế độ chạy trước
+    for _ in range(warmup):
+        for question in QUESTIONS:
+            executor.invoke({"input": question, "history": "(chưa có)"})
+    wall, usages = [], []
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            handler = TokenBudgetHandler(budget=10 ** 9)
+            start = time.perf_counter()
+            executor.invoke({"input": question, "history": "(chưa có)"}, config={"callbacks": [handler]})
+            wall.append(time.perf_counter() - start)
+            usages.append(handler.usage())
+    n = len(usages)
+    return {
+        "queries": n,
+        "avg_prompt_tokens": round(sum(u["prompt_tokens"] for u in usages) / n, 1),
+        "avg_completion_tokens": round(sum(u["completion_tokens"] for u in usages) / n, 1),
+        "avg_llm_calls": round(sum(u["llm_calls"] for u in usages) / n, 3),
+        "wall": summarize(wall),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Báo cáo token khi rút gọn output tool")
+    parser.add_argument("--workdir", default="bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--warmup", type=int, default=1, help="Số vòng chạy thử (không tính) mỗi chế độ")
+    parser.add_argument("--agent-mode", default="react", choices=["react", "tools"])
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=400)
+    parser.add_argument("--output", help="File JSON kết quả (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    apply_offline_env(args.workdir)
+    os.environ["FAKE_LLM_MS_PER_1K_TOKENS"] = str(args.ms_per_1k_tokens)
+    ensure_dataset(args.workdir, args.rows)
+    if not os.path.isdir(os.environ["CHROMA_PATH"]):
+        from load_data import load_to_chroma
+        load_to_chroma()
+
+    results = {
+        "verbose": run(args.agent_mode, False, args.rounds, args.warmup),
+        "compact": run(args.agent_mode, True, args.rounds, args.warmup),
+    }
+    base, new = results["verbose"], results["compact"]
+    results["savings"] = {
+        "prompt_tokens_pct": round(100 * (1 - new["avg_prompt_tokens"] / base["avg_prompt_tokens"]), 1),
+        "completion_tokens_pct": round(100 * (1 - new["avg_completion_tokens"] / base["avg_completion_tokens"]), 1),
+        "mean_latency_pct": round(100 * (1 - new["wall"]["mean_ms"] / base["wall"]["mean_ms"]), 1),
+        "p50_latency_pct": round(100 * (1 - new["wall"]["p50_ms"] / base["wall"]["p50_ms"]), 1),
+        "p95_latency_pct": round(100 * (1 - new["wall"]["p95_ms"] / base["wall"]["p95_ms"]), 1),
+        "p50_delta_ms": round(base["wall"]["p50_ms"] - new["wall"]["p50_ms"], 3),
+        "p95_delta_ms": round(base["wall"]["p95_ms"] - new["wall"]["p95_ms"], 3),
+    }
+    write_report({
+        "benchmark": "token_report",
+        "params": {"rows": args.rows, "rounds": args.rounds, "warmup": args.warmup, "agent_mode": args.agent_mode,
+                   "ms_per_1k_tokens": args.ms_per_1k_tokens},
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
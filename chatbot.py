@@ -1,23 +1,87 @@
 # chatbot.py
 import os
+import json
+import asyncio
+import logging
+from contextlib import nullcontext
+from functools import partial
+from typing import List, Union
 from dotenv import load_dotenv
-from langchain.agents import create_react_agent, AgentExecutor
+from langchain.agents import create_react_agent, create_tool_calling_agent, AgentExecutor
+from langchain.agents.agent import RunnableMultiActionAgent
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
+from langchain.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
 from config import SYSTEM_PROMPT
 from tools.quote_search import find_movie_by_quote
 from tools.recommend import recommend_movie_from_likes
 from tools.trending import get_trending_movies
+from tools.people_search import find_movies_by_person
+from tools.movie_filter import filter_movies
+from monitoring import MetricsCallbackHandler
+from sessions import Session, SharedToolCache, session_store, tool_cache_var, remember_tool_result, trim_history
+from token_budget import TokenBudgetHandler, TokenBudgetExceeded, compact_observation
 
 load_dotenv()
-google_api_key = os.getenv("GOOGLE_API_KEY")
-if not google_api_key:
-    raise ValueError("GOOGLE_API_KEY không được tìm thấy trong .env")
+logger = logging.getLogger("movies_chatbot.agent")
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.5, google_api_key=google_api_key)
-tools = [find_movie_by_quote, recommend_movie_from_likes, get_trending_movies]
+# === CẤU HÌNH AGENT ===
+# AGENT_MODE=react → ReAct parse text (mặc định cũ); tools → function calling, gọi nhiều tool song song
+AGENT_MODE = os.getenv("AGENT_MODE", "react")
+MAIN_MODEL = os.getenv("MAIN_MODEL", "gemini-2.5-pro")
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", "gemini-2.5-flash")  # model rẻ cho bước chọn tool
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "5"))
+AGENT_MAX_EXECUTION_TIME = float(os.getenv("AGENT_MAX_EXECUTION_TIME", "60"))  # giây
+
+# LLM_BACKEND=fake → LLM giả lập theo kịch bản (benchmark offline, không gọi Gemini)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+if LLM_BACKEND == "fake":
+    from benchmarks.stubs import ScriptedChatModel
+    llm = ScriptedChatModel()
+    router_llm = ScriptedChatModel(model_name="fake-router")
+else:
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        raise ValueError("GOOGLE_API_KEY không được tìm thấy trong .env")
+
+    llm = ChatGoogleGenerativeAI(model=MAIN_MODEL, temperature=0.5, google_api_key=google_api_key)
+    router_llm = ChatGoogleGenerativeAI(model=ROUTER_MODEL, temperature=0, google_api_key=google_api_key)
+
+
+def wrap_tool(t):
+    """Bọc tool:
+    - rút gọn output Markdown thành dạng ngắn trước khi vào scratchpad (tiết kiệm token);
+    - cùng input đã gọi trong session (hoặc batch) hiện tại thì dùng lại observation,
+      không truy vấn lại Chroma/PostgreSQL."""
+    func = t.func
+
+    def cached(*args, **kwargs):
+        cache = tool_cache_var.get()
+        if cache is None:
+            return compact_observation(func(*args, **kwargs))
+        values = list(args) + [kwargs[k] for k in sorted(kwargs)]
+        key = f"{t.name}::" + json.dumps([str(v).strip().lower() for v in values], ensure_ascii=False)
+        with cache.key_lock(key) if isinstance(cache, SharedToolCache) else nullcontext():
+            if key in cache:
+                logger.info("tool cache hit name=%s", t.name)
+                return cache[key]
+            observation = compact_observation(func(*args, **kwargs))
+            if not str(observation).startswith("Lỗi"):
+                remember_tool_result(cache, key, observation)
+            return observation
+
+    return StructuredTool(name=t.name, description=t.description, args_schema=t.args_schema, func=cached)
+
+
+tools = [wrap_tool(t) for t in (
+    find_movie_by_quote, recommend_movie_from_likes, get_trending_movies, find_movies_by_person, filter_movies,
+)]
 
 # PROMPT ĐẦY ĐỦ {tools} + {tool_names}
+# Phần tĩnh (hướng dẫn + mô tả tool) luôn đứng đầu, phần động (lịch sử, câu hỏi) ở cuối
+# → tiền tố giống hệt giữa các request/bước để provider cache prompt (implicit caching của Gemini 2.5).
 prompt = PromptTemplate.from_template(
     """Bạn là trợ lý điện ảnh thông minh. Trả lời bằng tiếng Việt.
 
@@ -39,17 +103,159 @@ prompt = PromptTemplate.from_template(
     Thought: Tôi đã có đủ thông tin để trả lời
     Final Answer: [câu trả lời cuối cùng]
 
+    Lịch sử hội thoại:
+    {history}
+
     Bắt đầu!
 
     Question: {input}
     {agent_scratchpad}"""
 )
 
-agent = create_react_agent(llm, tools, prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+# PROMPT CHO FUNCTION CALLING (mô tả tool được gửi qua API, không nằm trong prompt)
+tool_calling_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "Bạn là trợ lý điện ảnh thông minh. Trả lời bằng tiếng Việt. "
+     "Chỉ dùng dữ liệu từ công cụ, không bịa đặt. "
+     "Nếu câu hỏi cần nhiều công cụ độc lập (vd. phim hot + gợi ý phim), hãy gọi TẤT CẢ trong cùng một lượt."),
+    ("system", "Lịch sử hội thoại:\n{history}"),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
+
 
-def chat_with_bot(query: str) -> str:
+def build_tool_calling_agent():
+    """Agent function calling: bước đầu (chọn tool) dùng ROUTER_MODEL, khi đã có kết quả tool thì MAIN_MODEL tổng hợp."""
+    router = create_tool_calling_agent(router_llm, tools, tool_calling_prompt)
+    answerer = create_tool_calling_agent(llm, tools, tool_calling_prompt)
+    dispatch = RunnableLambda(lambda x: answerer if x["intermediate_steps"] else router)
+    return RunnableMultiActionAgent(
+        runnable=dispatch.with_types(output_type=Union[List[AgentAction], AgentFinish]),
+        stream_runnable=False,
+    )
+
+
+def build_agent_executor(mode: str = AGENT_MODE) -> AgentExecutor:
+    if mode == "tools":
+        agent = build_tool_calling_agent()
+    else:
+        agent = create_react_agent(llm, tools, prompt)
+    # Bỏ verbose (in ra stdout) — log có cấu trúc qua MetricsCallbackHandler + LOG_LEVEL
+    # Giới hạn cứng số vòng lặp và thời gian để tránh agent lặp vô hạn
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=False,
+        handle_parsing_errors=True,
+        max_iterations=AGENT_MAX_ITERATIONS,
+        max_execution_time=AGENT_MAX_EXECUTION_TIME,
+        early_stopping_method="force",
+    )
+
+
+agent_executor = build_agent_executor()
+
+SUMMARY_PROMPT = """Tóm tắt ngắn gọn (tối đa 3 câu, tiếng Việt) cuộc hội thoại về phim dưới đây.
+Giữ lại tên phim, năm và sở thích của người dùng.
+
+{summary}
+{turns}"""
+
+
+def summarize_turns(summary: str, turns, callbacks=None) -> str:
+    """Tóm tắt cuốn chiếu: gộp summary cũ + các lượt bị cắt bằng model rẻ.
+    callbacks của request → token tóm tắt được tính vào usage/ngân sách và metrics như các bước agent."""
+    text = "\n".join(f"Người dùng: {q}\nTrợ lý: {a}" for q, a in turns)
     try:
-        return agent_executor.invoke({"input": query})["output"]
+        return router_llm.invoke(SUMMARY_PROMPT.format(summary=summary, turns=text),
+                                 config={"callbacks": callbacks}).content
+    except Exception:
+        logger.warning("Không tóm tắt được lịch sử, cắt bớt thay thế", exc_info=True)
+        return f"{summary}\n{text}"[-1000:]
+
+
+def load_session(session_id):
+    if not session_id:
+        return None
+    return session_store.get(session_id) or Session(session_id=session_id)
+
+
+def remember_turn(session, query: str, answer: str, ok: bool = True, callbacks=None):
+    """Ghi session sau mỗi request, kể cả khi lỗi (giữ và tính dung lượng cache tool đã thêm);
+    chỉ lượt thành công mới vào lịch sử."""
+    if session is None:
+        return
+    if ok:
+        session.turns.append((query, answer))
+        trim_history(session, partial(summarize_turns, callbacks=callbacks))
+    session_store.save(session)
+
+
+def _agent_inputs(query: str, session):
+    return {"input": query, "history": session.render_history() if session else "(chưa có)"}
+
+
+BUDGET_EXCEEDED_MESSAGE = "Câu hỏi cần quá nhiều bước xử lý, bạn hỏi ngắn gọn/cụ thể hơn được không?"
+
+
+def _callbacks(budget: TokenBudgetHandler):
+    return [MetricsCallbackHandler(), budget]
+
+
+def chat_with_bot(query: str, session_id: str = None) -> str:
+    session = load_session(session_id)
+    callbacks = _callbacks(TokenBudgetHandler())
+    token = tool_cache_var.set(session.tool_cache if session else None)
+    answer, ok = None, False
+    try:
+        answer = agent_executor.invoke(
+            _agent_inputs(query, session),
+            config={"callbacks": callbacks}
+        )["output"]
+        ok = True
+    except TokenBudgetExceeded as e:
+        logger.warning("%s", e)
+        answer = BUDGET_EXCEEDED_MESSAGE
     except Exception as e:
-        return f"Lỗi: {str(e)}"
\ No newline at end of file
+        logger.exception("Agent lỗi khi xử lý câu hỏi")
+        answer = f"Lỗi: {str(e)}"
+    finally:
+        tool_cache_var.reset(token)
+        remember_turn(session, query, answer, ok, callbacks)
+    return answer
+
+
+async def achat_with_usage(query: str, session_id: str = None, tool_cache=None):
+    """Như achat_with_bot nhưng trả về (câu trả lời, thông tin chạy: status + token đã dùng).
+    tool_cache: cache tool dùng chung khi không có session (vd. cả một batch)."""
+    session = load_session(session_id)
+    budget = TokenBudgetHandler()
+    callbacks = _callbacks(budget)
+    token = tool_cache_var.set(session.tool_cache if session else tool_cache)
+    answer, status = None, "error"
+    try:
+        result = await agent_executor.ainvoke(
+            _agent_inputs(query, session),
+            config={"callbacks": callbacks}
+        )
+        answer, status = result["output"], "ok"
+    except TokenBudgetExceeded as e:
+        logger.warning("%s", e)
+        answer, status = BUDGET_EXCEEDED_MESSAGE, "budget_exceeded"
+    except Exception as e:
+        logger.exception("Agent lỗi khi xử lý câu hỏi")
+        answer, status = f"Lỗi: {str(e)}", "error"
+    finally:
+        tool_cache_var.reset(token)
+        if status != "ok":
+            remember_turn(session, query, answer, ok=False)  # chỉ ghi cache tool, không gọi LLM
+    if status == "ok":
+        # Tóm tắt lịch sử có thể gọi LLM → chạy ngoài event loop; token tóm tắt tính vào usage
+        await asyncio.to_thread(remember_turn, session, query, answer, True, callbacks)
+    return answer, {"status": status, **budget.usage()}
+
+
+async def achat_with_bot(query: str, session_id: str = None) -> str:
+    """Bản async: không chặn event loop; ở chế độ tools các tool trong cùng lượt chạy song song."""
+    answer, _ = await achat_with_usage(query, session_id)
+    return answer
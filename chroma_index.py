@@ -0,0 +1,169 @@
+# chroma_index.py
+"""Chọn bộ collection Chroma đang phục vụ (blue/green).
+
+Bố cục thư mục CHROMA_PATH:
+    versions/<version>/   mỗi bản build là một PersistentClient riêng (+ neighbors/, manifest.json),
+                          collection có thể chia partition (partitions.py)
+    CURRENT               con trỏ {"version", "previous"}, thay bằng os.replace (atomic)
+Chưa có CURRENT → dùng thẳng CHROMA_PATH như trước (dữ liệu cũ vẫn chạy).
+
+Ứng dụng đang chạy tự mở bản mới khi CURRENT đổi (index_versions.py activate/rollback), không cần restart;
+client của bản cũ được đóng khi các lời gọi đang chạy trên nó kết thúc.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from chromadb import PersistentClient
+from chromadb.api.shared_system_client import SharedSystemClient
+
+from partitions import open_partitioned
+
+COLLECTION_NAMES = ("movie_overviews", "movie_quotes", "movie_metadata")
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "2"))  # tần suất kiểm tra con trỏ CURRENT
+LEGACY_VERSION = "legacy"
+
+
+def versions_dir(root: str) -> str:
+    return os.path.join(root, "versions")
+
+
+def version_path(root: str, version: str) -> str:
+    return os.path.join(versions_dir(root), version)
+
+
+def read_pointer(root: str):
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_pointer(root: str, version: str, previous: str = None):
+    """Ghi file tạm rồi os.replace: tiến trình đọc luôn thấy con trỏ cũ hoặc mới, không bao giờ ghi dở."""
+    tmp = os.path.join(root, "CURRENT.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "previous": previous, "activated_at": time.time()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, "CURRENT"))
+
+
+class _ClientHandle:
+    """Một PersistentClient kèm số lời gọi đang chạy trên nó."""
+
+    def __init__(self, path: str):
+        self.client = PersistentClient(path=path)
+        self.system = self.client._system  # thuộc tính tra cache dùng chung, giữ lại để stop sau khi đã gỡ
+        self.collections = {}
+        self.in_flight = 0
+        self.retired = False
+
+    def retire(self):
+        """Gỡ System khỏi cache dùng chung của Chroma ngay, để mở lại cùng thư mục (rollback) tạo System mới;
+        System cũ chỉ stop khi hết lời gọi đang chạy (xem close)."""
+        self.retired = True
+        systems = SharedSystemClient._identifier_to_system
+        if systems.get(self.client._identifier) is self.system:
+            del systems[self.client._identifier]
+
+    def close(self):
+        # Đóng SQLite, HNSW đã nạp và thread nền của bản cũ — không thì mỗi lần swap giữ lại cả một index trong RAM
+        self.system.stop()
+
+
+class ChromaIndex:
+    """Client Chroma của bản đang active; mở lại khi con trỏ CURRENT đổi."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.version = None
+        self.path = None
+        self._handle = None
+        self._pointer_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._handle is not None and now - self._checked_at < INDEX_POLL_SECONDS:
+            return
+        self._checked_at = now
+        pointer_file = os.path.join(self.root, "CURRENT")
+        mtime = os.path.getmtime(pointer_file) if os.path.exists(pointer_file) else None
+        if self._handle is not None and mtime == self._pointer_mtime:
+            return
+        pointer = read_pointer(self.root)
+        if pointer:
+            version, path = pointer["version"], version_path(self.root, pointer["version"])
+        else:
+            version, path = LEGACY_VERSION, self.root
+        if version != self.version:
+            old, self._handle = self._handle, _ClientHandle(path)
+            self.version, self.path = version, path
+            if old is not None:
+                old.retire()
+                if not old.in_flight:
+                    old.close()
+        self._pointer_mtime = mtime
+
+    def _collection(self, name: str):
+        handle = self._handle
+        if name not in handle.collections:
+            # Bản đã build trong versions/ không bị ghi thêm → cache được; bố cục cũ thì không
+            handle.collections[name] = open_partitioned(handle.client, name, frozen=self.version != LEGACY_VERSION)
+        return handle.collections[name]
+
+    def collection(self, name: str):
+        with self._lock:
+            self._refresh()
+            return self._collection(name)
+
+    @contextmanager
+    def lease(self, name: str):
+        """Collection của bản đang active, giữ client của nó mở tới khi ra khỏi khối with (kể cả khi đã swap)."""
+        with self._lock:
+            self._refresh()
+            handle = self._handle
+            handle.in_flight += 1
+            collection = self._collection(name)
+        try:
+            yield collection
+        finally:
+            with self._lock:
+                handle.in_flight -= 1
+                if handle.retired and not handle.in_flight:
+                    handle.close()
+
+    def current_version(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def neighbors_path(self):
+        """Đồ thị láng giềng đi kèm bản index đang active (None với bố cục cũ)."""
+        with self._lock:
+            self._refresh()
+            return None if self.version == LEGACY_VERSION else os.path.join(self.path, "neighbors")
+
+
+class CollectionProxy:
+    """Thay cho đối tượng Collection: mỗi lần gọi chuyển tới collection (đã gom partition) của bản đang active,
+    nên các module đã `from config import collection_overview` vẫn thấy bản mới sau khi swap."""
+
+    def __init__(self, index: ChromaIndex, name: str):
+        self._index = index
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._index.collection(self._name), attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            with self._index.lease(self._name) as collection:
+                return getattr(collection, attr)(*args, **kwargs)
+        return call
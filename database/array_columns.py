@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+import psycopg2
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# === Configuration ===
+DB_HOST = os.environ.get("DB_HOST")
+DB_PORT = os.environ.get("DB_PORT")
+DB_USER = os.environ.get("DB_USER")
+DB_NAME = os.environ.get("DB_NAME")
+DB_PASSWORD = os.environ.get("DB_PASS")
+
+BACKFILL_BATCH_SIZE = 50000
+
+# === SQL Definitions ===
+
+# Cột chuỗi "A, B, C" → cột text[] chữ thường tương ứng:
+# genres → genres_arr, production_companies → companies_arr, spoken_languages → languages_arr
+# (lọc theo người — cast/director — đi qua people_tsv, xem database/people_index.py)
+ADD_ARRAY_COLUMNS_SQL = """
+ALTER TABLE movies
+    ADD COLUMN IF NOT EXISTS genres_arr TEXT[],
+    ADD COLUMN IF NOT EXISTS companies_arr TEXT[],
+    ADD COLUMN IF NOT EXISTS languages_arr TEXT[];
+"""
+
+# Chuỗi rỗng → NULL thay vì '{""}'
+BACKFILL_BATCH_SQL = """
+UPDATE movies SET
+    genres_arr = regexp_split_to_array(lower(NULLIF(btrim("genres"), '')), '\\s*,\\s*'),
+    companies_arr = regexp_split_to_array(lower(NULLIF(btrim("production_companies"), '')), '\\s*,\\s*'),
+    languages_arr = regexp_split_to_array(lower(NULLIF(btrim("spoken_languages"), '')), '\\s*,\\s*')
+WHERE id > %(start)s AND id <= %(end)s;
+"""
+
+# GIN cho toán tử @> / && trên mảng, btree cho lọc theo năm
+CREATE_ARRAY_INDEXES_SQL = """
+CREATE INDEX {concurrently} IF NOT EXISTS idx_movies_genres_arr ON movies USING GIN (genres_arr);
+CREATE INDEX {concurrently} IF NOT EXISTS idx_movies_companies_arr ON movies USING GIN (companies_arr);
+CREATE INDEX {concurrently} IF NOT EXISTS idx_movies_languages_arr ON movies USING GIN (languages_arr);
+CREATE INDEX {concurrently} IF NOT EXISTS idx_movies_release_date ON movies (release_date);
+"""
+
+
+# cast_arr (bản trước) không query nào dùng → bỏ cột và GIN index để không phải ghi thừa
+DROP_UNUSED_SQL = """
+DROP INDEX {concurrently} IF EXISTS idx_movies_cast_arr;
+ALTER TABLE movies DROP COLUMN IF EXISTS cast_arr;
+"""
+
+
+def normalize_list(names):
+    """Danh sách tên → dạng lưu trong cột text[] (giống hệt BACKFILL_BATCH_SQL)."""
+    values = [name.strip().lower() for name in names if name and name.strip()]
+    return values or None
+
+
+def add_array_columns(cur):
+    cur.execute(ADD_ARRAY_COLUMNS_SQL)
+
+
+def drop_unused_columns(cur, concurrently=False):
+    for statement in DROP_UNUSED_SQL.strip().splitlines():
+        cur.execute(statement.format(concurrently="CONCURRENTLY" if concurrently else ""))
+
+
+def create_array_indexes(cur, concurrently=False):
+    """concurrently=True không khóa ghi bảng (cần autocommit, dùng cho DB đang chạy)."""
+    for statement in CREATE_ARRAY_INDEXES_SQL.strip().splitlines():
+        cur.execute(statement.format(concurrently="CONCURRENTLY" if concurrently else ""))
+    cur.execute("ANALYZE movies;")
+
+
+def backfill_arrays(cur, batch_size=BACKFILL_BATCH_SIZE, start_id=0):
+    """Điền các cột text[] theo từng khoảng id, mỗi batch một transaction ngắn (autocommit)
+    để không khóa cả bảng. Chạy lại với start_id để tiếp tục khi bị ngắt."""
+    cur.execute("SELECT MAX(id) FROM movies;")
+    max_id = cur.fetchone()[0] or 0
+    updated = 0
+    start = start_id
+    while start < max_id:
+        end = start + batch_size
+        cur.execute(BACKFILL_BATCH_SQL, {"start": start, "end": end})
+        updated += cur.rowcount
+        print(f"  ... id {start + 1}–{min(end, max_id)}: {updated} rows updated")
+        start = end
+    return updated
+
+
+def main():
+    """Backfill cột text[] + GIN index cho bảng movies đã import (idempotent, chạy lại được)."""
+    parser = argparse.ArgumentParser(description="Backfill genres/companies/languages arrays")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument("--start-id", type=int, default=0, help="Tiếp tục từ id này (bỏ qua id <= start-id)")
+    args = parser.parse_args()
+
+    if DB_PASSWORD is None:
+        print("Error: DB_PASS environment variable is not set.", file=sys.stderr)
+        sys.exit(1)
+
+    conn = None
+    cur = None
+    try:
+        print("Connecting to database...")
+        conn = psycopg2.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            dbname=DB_NAME
+        )
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print("1. Adding array columns (dropping unused cast_arr)...")
+        add_array_columns(cur)
+        drop_unused_columns(cur, concurrently=True)
+
+        print(f"2. Backfilling arrays in batches of {args.batch_size} ids...")
+        start = time.perf_counter()
+        updated = backfill_arrays(cur, args.batch_size, args.start_id)
+        print(f"   {updated} rows in {time.perf_counter() - start:.1f}s")
+
+        print("3. Creating GIN indexes (concurrently)...")
+        create_array_indexes(cur, concurrently=True)
+
+        print("\n✅ Array columns are ready.")
+
+    except (Exception, psycopg2.Error) as error:
+        print(f"\n❌ An error occurred: {error}", file=sys.stderr)
+
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import time
 from psycopg2 import extras, sql
 from datetime import date, timedelta
 from dotenv import load_dotenv
+from array_columns import add_array_columns, normalize_list
 
 # Load environment variables from .env file
 load_dotenv()
@@ -47,6 +48,10 @@ def format_list(items, key_name, max_items=20):
         return None
     return ", ".join([item[key_name] for item in items[:max_items]])
 
+def names_list(items, key_name, max_items=20):
+    """Same items as format_list, as a normalized list for the text[] columns."""
+    return normalize_list([item[key_name] for item in (items or [])[:max_items]])
+
 def find_crew(crew_list, job_title):
     """Finds the first crew member with a specific job."""
     for member in crew_list:
@@ -154,7 +159,11 @@ def parse_movie_details(movie_data):
             find_crew(crew_list, 'Original Music Composer'),
             None, # imdb_rating (not available from TMDB)
             None, # imdb_votes (not available from TMDB)
-            movie_data.get('poster_path')
+            movie_data.get('poster_path'),
+            # Array columns built from the API lists (no splitting of names that contain commas)
+            names_list(movie_data.get('genres', []), 'name'),
+            names_list(movie_data.get('production_companies', []), 'name'),
+            names_list(movie_data.get('spoken_languages', []), 'english_name')
         )
     except Exception as e:
         print(f"Error parsing data for movie ID {movie_data.get('id')}: {e}", file=sys.stderr)
@@ -172,7 +181,8 @@ def insert_movies_into_db(conn, cur, movies_to_insert):
         "id", "title", "vote_average", "vote_count", "status", "release_date", "revenue", "runtime", "budget",
         "imdb_id", "original_language", "original_title", "overview", "popularity", "tagline", "genres",
         "production_companies", "production_countries", "spoken_languages", "cast", "director",
-        "director_of_photography", "writers", "producers", "music_composer", "imdb_rating", "imdb_votes", "poster_path"
+        "director_of_photography", "writers", "producers", "music_composer", "imdb_rating", "imdb_votes", "poster_path",
+        "genres_arr", "companies_arr", "languages_arr"
     )
     VALUES %s
     ON CONFLICT ("id") DO NOTHING;
@@ -216,6 +226,10 @@ def main():
         )
         cur = conn.cursor()
 
+        # Make sure the text[] columns exist (no-op once database/array_columns.py has run)
+        add_array_columns(cur)
+        conn.commit()
+
         # === Step 1: Get Max Movie ID from DB ===
         print("1. Getting latest movie ID from database...")
         latest_id_in_db = get_latest_movie_id(cur)
@@ -5,6 +5,8 @@ import sys
 import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
+from people_index import create_people_index
+from array_columns import create_array_indexes
 
 # Load environment variables from .env file
 load_dotenv()
@@ -104,7 +106,10 @@ CREATE TABLE {final_table} (
     "music_composer" TEXT,
     "imdb_rating" FLOAT,
     "imdb_votes" BIGINT,
-    "poster_path" TEXT
+    "poster_path" TEXT,
+    "genres_arr" TEXT[],
+    "companies_arr" TEXT[],
+    "languages_arr" TEXT[]
 );
 """).format(final_table=sql.Identifier(FINAL_TABLE))
 
@@ -114,7 +119,8 @@ INSERT INTO {final_table} (
     "id", "title", "vote_average", "vote_count", "status", "release_date", "revenue", "runtime", "budget",
     "imdb_id", "original_language", "original_title", "overview", "popularity", "tagline", "genres",
     "production_companies", "production_countries", "spoken_languages", "cast", "director",
-    "director_of_photography", "writers", "producers", "music_composer", "imdb_rating", "imdb_votes", "poster_path"
+    "director_of_photography", "writers", "producers", "music_composer", "imdb_rating", "imdb_votes", "poster_path",
+    "genres_arr", "companies_arr", "languages_arr"
 )
 SELECT
     NULLIF("id", '')::BIGINT,
@@ -144,11 +150,14 @@ SELECT
     "music_composer",
     NULLIF("imdb_rating", '')::FLOAT,
     NULLIF("imdb_votes", '')::FLOAT,
-    "poster_path"
+    "poster_path",
+    regexp_split_to_array(lower(NULLIF(btrim("genres"), '')), '\\s*,\\s*'),
+    regexp_split_to_array(lower(NULLIF(btrim("production_companies"), '')), '\\s*,\\s*'),
+    regexp_split_to_array(lower(NULLIF(btrim("spoken_languages"), '')), '\\s*,\\s*')
 FROM {staging_table};
 """).format(final_table=sql.Identifier(FINAL_TABLE), staging_table=sql.Identifier(STAGING_TABLE))
 
-# Step 5: Clean up
+# Step 7: Clean up
 CLEANUP_SQL = sql.SQL("DROP TABLE {staging_table};").format(staging_table=sql.Identifier(STAGING_TABLE))
 
 def main():
@@ -191,8 +200,16 @@ def main():
         print("4. Casting and inserting data into final table...")
         cur.execute(INSERT_FINAL_SQL)
 
-        # === Step 5: Clean up ===
-        print("5. Cleaning up staging table...")
+        # === Step 5: Full-text index cho đạo diễn/diễn viên ===
+        print("5. Creating people search index...")
+        create_people_index(cur)
+
+        # === Step 6: GIN index cho các cột mảng (thể loại, diễn viên, hãng, ngôn ngữ) ===
+        print("6. Creating array column indexes...")
+        create_array_indexes(cur)
+
+        # === Step 7: Clean up ===
+        print("7. Cleaning up staging table...")
         cur.execute(CLEANUP_SQL)
 
         print(f"\n✅ Import complete! Data is now in the '{FINAL_TABLE}' table.")
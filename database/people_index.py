@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# === Configuration ===
+DB_HOST = os.environ.get("DB_HOST")
+DB_PORT = os.environ.get("DB_PORT")
+DB_USER = os.environ.get("DB_USER")
+DB_NAME = os.environ.get("DB_NAME")
+DB_PASSWORD = os.environ.get("DB_PASS")
+
+# === SQL Definitions ===
+
+# Full-text search cho đạo diễn / diễn viên / ekip:
+# - unaccent để tìm "Bong Joon Ho" hay "Pedro Almodovar" không cần dấu
+# - config 'simple' (không stemming) → dùng được cho tên người mọi ngôn ngữ
+# - trọng số: A = đạo diễn, B = diễn viên, C = biên kịch/nhà sản xuất/quay phim/nhạc
+# - cột GENERATED ... STORED tự cập nhật khi import/crawl, không cần trigger
+PEOPLE_INDEX_SQL = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+ALTER TABLE movies ADD COLUMN IF NOT EXISTS people_tsv tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple'::regconfig, f_unaccent(coalesce("director", ''))), 'A') ||
+    setweight(to_tsvector('simple'::regconfig, f_unaccent(coalesce("cast", ''))), 'B') ||
+    setweight(to_tsvector('simple'::regconfig, f_unaccent(
+        coalesce("writers", '') || ' ' || coalesce("producers", '') || ' ' ||
+        coalesce("director_of_photography", '') || ' ' || coalesce("music_composer", '')
+    )), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_movies_people_tsv ON movies USING GIN (people_tsv);
+CREATE INDEX IF NOT EXISTS idx_movies_popularity ON movies (popularity DESC NULLS LAST);
+ANALYZE movies;
+"""
+
+
+def create_people_index(cur):
+    cur.execute(PEOPLE_INDEX_SQL)
+
+
+def main():
+    """Thêm cột people_tsv + GIN index cho bảng movies đã có (chạy 1 lần, idempotent)."""
+    if DB_PASSWORD is None:
+        print("Error: DB_PASS environment variable is not set.", file=sys.stderr)
+        sys.exit(1)
+
+    conn = None
+    cur = None
+    try:
+        print("Connecting to database...")
+        conn = psycopg2.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            dbname=DB_NAME
+        )
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print("Creating people full-text index (this rewrites the movies table once)...")
+        create_people_index(cur)
+        print("\n✅ People search index is ready.")
+
+    except (Exception, psycopg2.Error) as error:
+        print(f"\n❌ An error occurred: {error}", file=sys.stderr)
+
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+# index_versions.py
+"""Quản lý các bản index Chroma (blue/green), bố cục thư mục xem chroma_index.py.
+
+    python index_versions.py build                 # build bản mới → validate → activate
+    python index_versions.py build --no-activate   # chỉ build + validate
+    python index_versions.py validate <version>
+    python index_versions.py activate <version>    # swap con trỏ CURRENT (app tự nhận, không restart)
+    python index_versions.py rollback              # quay về bản trước đó
+    python index_versions.py list
+    python index_versions.py export <version> snapshot.tar.gz
+    python index_versions.py restore snapshot.tar.gz --activate   # node mới: không cần embed lại
+
+Bản đang phục vụ không bị động tới khi build; build lỗi hoặc validate fail thì con trỏ giữ nguyên.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+from chromadb import PersistentClient
+
+from chroma_index import (COLLECTION_NAMES, read_pointer, version_path, versions_dir,
+                          write_pointer)
+from config import CHROMA_PATH, EMBEDDING_MODEL, embedding_fn
+from partitions import CHROMA_PARTITION_KEY, open_partitioned
+
+# === CẤU HÌNH ===
+INDEX_MIN_RECALL = float(os.getenv("INDEX_MIN_RECALL", "0.95"))  # self-recall@1 tối thiểu trên mẫu
+# Tỉ lệ truy vấn bằng text (quotes/metadata) tìm đúng document: document theo mẫu gần trùng nhau nên HNSW
+# đôi khi trả phim khác → ngưỡng thấp hơn recall, vẫn bắt được lệch encoder (khi đó gần như 0%)
+INDEX_MIN_TEXT_HIT_RATE = float(os.getenv("INDEX_MIN_TEXT_HIT_RATE", "0.9"))
+INDEX_MIN_COVERAGE = float(os.getenv("INDEX_MIN_COVERAGE", "0.95"))  # số phim nạp được / số phim truy vấn
+INDEX_MAX_SHRINK = float(os.getenv("INDEX_MAX_SHRINK", "0.2"))  # giảm tối đa so với bản đang active
+INDEX_SAMPLE_SIZE = int(os.getenv("INDEX_SAMPLE_SIZE", "50"))
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))  # luôn giữ thêm bản active + bản trước đó
+
+MANIFEST = "manifest.json"
+
+
+class IndexVersionError(ValueError):
+    pass
+
+
+def read_manifest(path: str) -> dict:
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(path: str, manifest: dict):
+    tmp = os.path.join(path, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+
+def list_versions(root: str):
+    if not os.path.isdir(versions_dir(root)):
+        return []
+    return sorted(name for name in os.listdir(versions_dir(root))
+                  if os.path.isdir(version_path(root, name)) and not name.startswith("."))
+
+
+def new_version(root: str) -> str:
+    """Tạo thư mục cho bản mới; hai lần build trong cùng một giây → thêm hậu tố -1, -2... (vẫn sắp đúng thứ tự)."""
+    os.makedirs(versions_dir(root), exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for attempt in itertools.count():
+        version = f"{stamp}-{attempt}" if attempt else stamp
+        try:
+            os.makedirs(version_path(root, version), exist_ok=False)
+            return version
+        except FileExistsError:
+            continue
+
+
+def open_collections(path: str):
+    client = PersistentClient(path=path)
+    return tuple(open_partitioned(client, name) for name in COLLECTION_NAMES)
+
+
+# === VALIDATE ===
+def sample_self_recall(coll, sample_ids):
+    """Truy vấn bằng chính embedding đã lưu → tỉ lệ mẫu tự tìm thấy chính nó ở top 1."""
+    page = coll.get(ids=sample_ids, include=["embeddings"])
+    results = coll.query(query_embeddings=page["embeddings"], n_results=1, include=["distances"])
+    # Phim trùng overview có embedding trùng → khoảng cách 0 cũng tính là đúng
+    hits = sum(found[:1] == [expected] or (dist and dist[0] < 1e-6)
+               for expected, found, dist in zip(page["ids"], results["ids"], results["distances"]))
+    return hits / len(page["ids"])
+
+
+def sample_text_queries(coll, sample_ids):
+    """Embed lại document bằng encoder đang phục vụ → document (cùng nội dung) phải đứng đầu
+    (bắt lỗi lệch model/số chiều giữa lúc build và lúc query)."""
+    page = coll.get(ids=sample_ids, include=["documents"])
+    results = coll.query(query_embeddings=[embedding_fn(doc) for doc in page["documents"]],
+                         n_results=1, include=["documents", "distances"])
+    # Vector khác nhưng cách query đúng bằng document cần tìm (khoảng cách 0, document trùng nội dung) cũng tính
+    hits = sum(found[:1] == [doc] or (dist and dist[0] < 1e-6)
+               for doc, found, dist in zip(page["documents"], results["documents"], results["distances"]))
+    return hits / len(page["documents"])
+
+
+def validate_version(root: str, version: str, sample_size=INDEX_SAMPLE_SIZE) -> dict:
+    """Kiểm tra số lượng, truy vấn mẫu, recall và đồ thị láng giềng; ghi kết quả vào manifest."""
+    path = version_path(root, version)
+    if not os.path.isdir(path):
+        raise IndexVersionError(f"Không có bản index {version}")
+    manifest = read_manifest(path)
+    overview, quotes, metadata = open_collections(path)
+    counts = {coll.name: coll.count() for coll in (overview, quotes, metadata)}
+    errors, checks = [], {"counts": counts, "partitions": {coll.name: sorted(coll.parts)
+                                                           for coll in (overview, quotes, metadata)}}
+    if len({tuple(parts) for parts in checks["partitions"].values()}) > 1:
+        errors.append(f"Các collection chia partition khác nhau: {checks['partitions']}")
+
+    if min(counts.values()) == 0:
+        errors.append(f"Có collection rỗng: {counts}")
+    elif len(set(counts.values())) > 1:
+        errors.append(f"Số vector lệch giữa các collection: {counts}")
+
+    expected = manifest.get("expected")
+    if expected and counts[overview.name] < INDEX_MIN_COVERAGE * expected:
+        errors.append(f"Chỉ nạp {counts[overview.name]}/{expected} phim (< {INDEX_MIN_COVERAGE:.0%})")
+
+    pointer = read_pointer(root)
+    if pointer and pointer["version"] != version:
+        active_counts = read_manifest(version_path(root, pointer["version"])).get("counts", {})
+        active = active_counts.get(overview.name)
+        if active and counts[overview.name] < (1 - INDEX_MAX_SHRINK) * active:
+            errors.append(f"Số phim giảm từ {active} xuống {counts[overview.name]} so với bản đang active")
+
+    if not errors:
+        ids = overview.get(include=[])["ids"]
+        # Seed theo version: build và restore của cùng một bản validate trên cùng một mẫu
+        sample = random.Random(version).sample(sorted(ids), min(sample_size, len(ids)))
+        suffixes = [i.split("_", 1)[1] for i in sample]
+        checks["recall_at_1"] = round(sample_self_recall(overview, sample), 4)
+        if checks["recall_at_1"] < INDEX_MIN_RECALL:
+            errors.append(f"Recall@1 = {checks['recall_at_1']} < {INDEX_MIN_RECALL}")
+        for coll, prefix in ((quotes, "quote"), (metadata, "meta")):
+            hit_rate = round(sample_text_queries(coll, [f"{prefix}_{s}" for s in suffixes]), 4)
+            checks[f"{coll.name}_query_hit_rate"] = hit_rate
+            if hit_rate < INDEX_MIN_TEXT_HIT_RATE:
+                errors.append(f"Truy vấn mẫu {coll.name}: chỉ {hit_rate:.0%} tìm đúng document")
+
+    graph_meta = os.path.join(path, "neighbors", "meta.json")
+    if os.path.exists(graph_meta):
+        with open(graph_meta) as f:
+            checks["neighbors"] = json.load(f)["count"]
+        if checks["neighbors"] != counts[overview.name]:
+            errors.append(f"Đồ thị láng giềng có {checks['neighbors']} phim, Chroma có {counts[overview.name]}")
+    else:
+        errors.append("Thiếu đồ thị láng giềng (neighbors/meta.json)")
+
+    manifest["counts"] = counts
+    manifest["validation"] = {"ok": not errors, "errors": errors, "checks": checks, "validated_at": time.time()}
+    write_manifest(path, manifest)
+    return manifest["validation"]
+
+
+# === BUILD / SWAP ===
+def build_version(root: str = CHROMA_PATH) -> str:
+    """Nạp PostgreSQL → bộ collection mới trong versions/<version>/, kèm đồ thị láng giềng."""
+    from load_data import load_to_chroma
+    from neighbors import build_neighbor_graph
+
+    version = new_version(root)
+    path = version_path(root, version)
+    write_manifest(path, {"version": version, "status": "building", "embedding_model": EMBEDDING_MODEL,
+                          "partition_key": CHROMA_PARTITION_KEY, "created_at": time.time()})
+    start = time.perf_counter()
+    manifest = read_manifest(path)
+    try:
+        target = open_collections(path)
+        loaded, expected = load_to_chroma(target)
+        if loaded:
+            build_neighbor_graph(os.path.join(path, "neighbors"), collection=target[0])
+    except Exception:
+        manifest["status"] = "failed"
+        write_manifest(path, manifest)
+        raise
+    manifest.update(status="built", loaded=loaded, expected=expected,
+                    build_seconds=round(time.perf_counter() - start, 1))
+    write_manifest(path, manifest)
+    return version
+
+
+def activate_version(root: str, version: str, force=False):
+    path = version_path(root, version)
+    if not os.path.isdir(path):
+        raise IndexVersionError(f"Không có bản index {version}")
+    validation = read_manifest(path).get("validation") or {}
+    if not validation.get("ok") and not force:
+        raise IndexVersionError(f"Bản {version} chưa validate thành công (dùng --force để bỏ qua)")
+    pointer = read_pointer(root)
+    current = pointer["version"] if pointer else None
+    if current == version:
+        return
+    write_pointer(root, version, previous=current)
+    prune_versions(root)
+
+
+def rollback(root: str) -> str:
+    pointer = read_pointer(root)
+    if not pointer or not pointer.get("previous"):
+        raise IndexVersionError("Không có bản trước đó để rollback")
+    if not os.path.isdir(version_path(root, pointer["previous"])):
+        raise IndexVersionError(f"Bản trước đó {pointer['previous']} đã bị xóa")
+    write_pointer(root, pointer["previous"], previous=pointer["version"])
+    return pointer["previous"]
+
+
+def prune_versions(root: str, keep=INDEX_KEEP_VERSIONS):
+    """Xóa bản cũ, giữ `keep` bản mới nhất và luôn giữ bản active + bản trước đó (để rollback)."""
+    pointer = read_pointer(root) or {}
+    protected = {pointer.get("version"), pointer.get("previous")}
+    versions = list_versions(root)
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version not in protected:
+            shutil.rmtree(version_path(root, version), ignore_errors=True)
+
+
+# === SNAPSHOT ===
+def export_version(root: str, version: str, output: str):
+    """Nén một bản index (Chroma + đồ thị láng giềng + manifest) thành .tar.gz."""
+    path = version_path(root, version)
+    if not read_manifest(path).get("validation", {}).get("ok"):
+        raise IndexVersionError(f"Chỉ export bản đã validate thành công ({version})")
+    with tarfile.open(output, "w:gz", compresslevel=6) as tar:
+        tar.add(path, arcname=version)
+
+
+def restore_version(root: str, archive: str) -> str:
+    """Giải nén vào thư mục tạm trong versions/ rồi rename (atomic), sau đó validate lại tại chỗ."""
+    os.makedirs(versions_dir(root), exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".restore-", dir=versions_dir(root))
+    try:
+        with tarfile.open(archive, "r:gz") as tar:
+            # filter="data" chặn path traversal/symlink ra ngoài (Python 3.11.4+)
+            kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+            tar.extractall(tmp, **kwargs)
+        entries = os.listdir(tmp)
+        if len(entries) != 1 or not os.path.exists(os.path.join(tmp, entries[0], MANIFEST)):
+            raise IndexVersionError("Snapshot không hợp lệ: cần đúng một thư mục phiên bản có manifest.json")
+        version = entries[0]
+        if os.path.exists(version_path(root, version)):
+            raise IndexVersionError(f"Bản {version} đã tồn tại")
+        os.replace(os.path.join(tmp, version), version_path(root, version))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build/validate/swap các bản index Chroma")
+    parser.add_argument("--root", default=CHROMA_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build bản mới từ PostgreSQL")
+    build.add_argument("--no-activate", action="store_true")
+    sub.add_parser("validate").add_argument("version")
+    activate = sub.add_parser("activate")
+    activate.add_argument("version")
+    activate.add_argument("--force", action="store_true", help="Activate dù chưa validate thành công")
+    sub.add_parser("rollback")
+    sub.add_parser("list")
+    export = sub.add_parser("export")
+    export.add_argument("version")
+    export.add_argument("output")
+    restore = sub.add_parser("restore")
+    restore.add_argument("archive")
+    restore.add_argument("--activate", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command in ("build", "restore"):
+            if args.command == "build":
+                version = build_version(args.root)
+                print(f"Đã build bản {version}")
+            else:
+                version = restore_version(args.root, args.archive)
+                print(f"Đã restore bản {version}")
+            validation = validate_version(args.root, version)
+            print(json.dumps(validation, ensure_ascii=False))
+            if not validation["ok"]:
+                print(f"❌ Bản {version} không đạt, giữ nguyên bản đang phục vụ", file=sys.stderr)
+                sys.exit(1)
+            if (args.command == "build" and not args.no_activate) or (args.command == "restore" and args.activate):
+                activate_version(args.root, version)
+                print(f"✅ Đang phục vụ bản {version}")
+        elif args.command == "validate":
+            validation = validate_version(args.root, args.version)
+            print(json.dumps(validation, ensure_ascii=False))
+            sys.exit(0 if validation["ok"] else 1)
+        elif args.command == "activate":
+            activate_version(args.root, args.version, force=args.force)
+            print(f"✅ Đang phục vụ bản {args.version}")
+        elif args.command == "rollback":
+            print(f"✅ Đã rollback về bản {rollback(args.root)}")
+        elif args.command == "list":
+            pointer = read_pointer(args.root) or {}
+            for version in list_versions(args.root):
+                manifest = read_manifest(version_path(args.root, version))
+                mark = "*" if version == pointer.get("version") else " "
+                ok = (manifest.get("validation") or {}).get("ok")
+                print(f"{mark} {version}  {manifest.get('status', '?'):8} valid={ok}  counts={manifest.get('counts')}")
+        elif args.command == "export":
+            export_version(args.root, args.version, args.output)
+            print(f"✅ Đã export {args.version} → {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+    except IndexVersionError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
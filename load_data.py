@@ -1,27 +1,71 @@
 # load_data.py
-from config import SessionLocal, collection_overview, collection_quotes, collection_metadata, embedding_fn
+import os
+from config import SessionLocal, collection_overview, collection_quotes, collection_metadata, embedding_batch_fn
+from partitions import partition_metadata
 from sqlalchemy import text
 
-def load_to_chroma():
-    db = SessionLocal()
-    try:
-        print("Đang truy vấn dữ liệu từ PostgreSQL...")
-        movies = db.execute(text("""
-            SELECT id, title, overview, release_date
-            FROM movies
-            WHERE overview IS NOT NULL 
-              AND TRIM(overview) != ''
-              AND vote_count > 50
-            ORDER BY vote_count DESC
-            LIMIT 10000
-        """)).fetchall()
+# === CẤU HÌNH ===
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "256"))  # số phim mỗi lần encode + add
+# Phim có vote_count >= ngưỡng; 0 = toàn bộ catalog có overview (kể cả vote_count NULL)
+LOAD_MIN_VOTE_COUNT = int(os.getenv("LOAD_MIN_VOTE_COUNT", "50"))
+
+# Không còn LIMIT: collection được chia partition (partitions.py) nên index được toàn bộ catalog.
+# ORDER BY id theo khóa chính → stream ngay, không phải sắp xếp cả bảng.
+MOVIES_SQL = text("""
+    SELECT id, title, overview, release_date, original_language
+    FROM movies
+    WHERE overview IS NOT NULL
+      AND TRIM(overview) != ''
+      AND (:min_votes <= 0 OR vote_count >= :min_votes)
+    ORDER BY id
+""")
+
+
+def load_batch(rows, overview_coll, quotes_coll, metadata_coll):
+    ids, overviews, quotes, meta_texts, metas, quote_metas = [], [], [], [], [], []
+    for m in rows:
+        mid = str(m.id)
+        year = m.release_date.strftime("%Y") if m.release_date else "N/A"
+        extra = partition_metadata(m.original_language, m.release_date)
+        ids.append(mid)
+        overviews.append((m.overview or "").strip())
+        quotes.append(f"Câu thoại nổi tiếng từ {m.title}...")
+        meta_texts.append(f"{m.title} {year}")
+        metas.append({"movie_id": mid, "title": m.title, "year": year, **extra})
+        quote_metas.append({"movie_id": mid, **extra})
+
+    # Overview
+    overview_coll.add(
+        ids=[f"overview_{mid}" for mid in ids],
+        documents=overviews,
+        metadatas=metas,
+        embeddings=embedding_batch_fn(overviews)
+    )
+    # Quote
+    quotes_coll.add(
+        ids=[f"quote_{mid}" for mid in ids],
+        documents=quotes,
+        metadatas=quote_metas,
+        embeddings=embedding_batch_fn(quotes)
+    )
+    # Metadata
+    metadata_coll.add(
+        ids=[f"meta_{mid}" for mid in ids],
+        documents=meta_texts,
+        metadatas=metas,
+        embeddings=embedding_batch_fn(meta_texts)
+    )
 
-        if not movies:
-            print("Không có phim nào trong cơ sở dữ liệu!")
-            return
 
+def load_to_chroma(target=None):
+    """Nạp phim từ PostgreSQL vào (overview, quotes, metadata) → (số phim nạp được, số phim truy vấn được).
+    Mặc định ghi đè các collection đang phục vụ; index_versions.py truyền collection của một bản build mới."""
+    overview_coll, quotes_coll, metadata_coll = target or (collection_overview, collection_quotes, collection_metadata)
+    success_count, total = 0, 0
+    db = SessionLocal()
+    try:
         print("Đang xóa dữ liệu cũ trong ChromaDB...")
-        for coll in [collection_overview, collection_quotes, collection_metadata]:
+        for coll in [overview_coll, quotes_coll, metadata_coll]:
             try:
                 existing = coll.get(include=[])
                 if existing["ids"]:
@@ -31,49 +75,33 @@ def load_to_chroma():
             except Exception as e:
                 print(f"Không thể xóa {coll.name}: {e}")
 
-        print("Đang thêm 1000 phim vào ChromaDB...")
-        success_count = 0
-        for m in movies:
-            mid = str(m[0])
-            title = m[1]
-            overview = (m[2] or "").strip()
-            date = m[3]
-            year = date.strftime("%Y") if date else "N/A"
-
+        print("Đang truy vấn dữ liệu từ PostgreSQL...")
+        # stream_results: PostgreSQL dùng server-side cursor, không kéo cả catalog vào RAM
+        result = db.execute(MOVIES_SQL, {"min_votes": LOAD_MIN_VOTE_COUNT},
+                            execution_options={"stream_results": True})
+        for rows in result.partitions(LOAD_BATCH_SIZE):
+            total += len(rows)
             try:
-                # Overview
-                collection_overview.add(
-                    ids=[f"overview_{mid}"],
-                    documents=[overview],
-                    metadatas=[{"movie_id": mid, "title": title, "year": year}],
-                    embeddings=[embedding_fn(overview)]
-                )
-                # Quote
-                quote = f"Câu thoại nổi tiếng từ {title}..."
-                collection_quotes.add(
-                    ids=[f"quote_{mid}"],
-                    documents=[quote],
-                    metadatas=[{"movie_id": mid}],
-                    embeddings=[embedding_fn(quote)]
-                )
-                # Metadata
-                meta_text = f"{title} {year}"
-                collection_metadata.add(
-                    ids=[f"meta_{mid}"],
-                    documents=[meta_text],
-                    metadatas=[{"movie_id": mid, "title": title, "year": year}],
-                    embeddings=[embedding_fn(meta_text)]
-                )
-                success_count += 1
+                load_batch(rows, overview_coll, quotes_coll, metadata_coll)
+                success_count += len(rows)
             except Exception as e:
-                print(f"Lỗi thêm phim {mid}: {e}")
+                print(f"Lỗi thêm phim {rows[0].id}..{rows[-1].id}: {e}")
+            if total % (LOAD_BATCH_SIZE * 40) < LOAD_BATCH_SIZE:
+                print(f"Đã xử lý {total} phim...")
+
+        if not total:
+            print("Không có phim nào trong cơ sở dữ liệu!")
+            return success_count, total
+
+        print(f"ĐÃ THÊM THÀNH CÔNG {success_count}/{total} PHIM!")
 
-        print(f"ĐÃ THÊM THÀNH CÔNG {success_count}/1000 PHIM!")
-        
     except Exception as e:
         print(f"LỖI: {e}")
     finally:
         db.close()
+    return success_count, total
 
 if __name__ == "__main__":
-    load_to_chroma()
\ No newline at end of file
+    # Build bản index mới bên cạnh bản đang phục vụ (kèm đồ thị láng giềng) → validate → swap con trỏ
+    from index_versions import main
+    main(["build"])
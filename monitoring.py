@@ -0,0 +1,213 @@
+# monitoring.py
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import event
+
+from token_budget import count_tokens, count_message_tokens, completion_text, extract_token_usage
+
+# === LOGGING ===
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" hoặc "json"
+
+# Trace ID của request hiện tại (gắn vào mọi dòng log)
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def setup_logging():
+    """Cấu hình logging có cấu trúc, mức log điều khiển bằng LOG_LEVEL."""
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s level=%(levelname)s logger=%(name)s trace_id=%(trace_id)s %(message)s"
+        ))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+
+logger = logging.getLogger("movies_chatbot.metrics")
+
+# === PROMETHEUS METRICS ===
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_LATENCY = Histogram(
+    "chatbot_stage_latency_seconds",
+    "Thời gian xử lý từng giai đoạn (agent_step, llm, tool, embedding, chroma_query, sql)",
+    ["stage", "name"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_LATENCY = Histogram(
+    "chatbot_http_request_seconds",
+    "Thời gian xử lý HTTP request",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "chatbot_llm_tokens_total",
+    "Số token LLM đã dùng",
+    ["model", "kind"],
+)
+API_CACHE = Counter(
+    "chatbot_api_cache_total",
+    "Kết quả cache của các endpoint /api (hit, miss, not_modified)",
+    ["endpoint", "result"],
+)
+
+
+def observe(stage: str, name: str, seconds: float):
+    STAGE_LATENCY.labels(stage=stage, name=name).observe(seconds)
+    logger.debug("stage=%s name=%s duration_ms=%.1f", stage, name, seconds * 1000)
+
+
+@contextmanager
+def timed(stage: str, name: str = ""):
+    """Đo thời gian một khối lệnh và ghi vào histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, name, time.perf_counter() - start)
+
+
+def metrics_payload():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# === SQL ===
+def instrument_engine(engine):
+    """Gắn event listener để đo thời gian mỗi câu SQL."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        observe("sql", _sql_verb(statement), time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        # Câu lỗi không tới after_cursor_execute → tự pop, tránh stack trên connection (nằm lại trong pool)
+        # lớn dần và các câu sau ghép nhầm thời điểm bắt đầu
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            observe("sql", f"{_sql_verb(exception_context.statement)}:error", time.perf_counter() - starts.pop())
+
+
+def _sql_verb(statement) -> str:
+    """Dùng từ khóa đầu tiên làm nhãn để tránh bùng nổ cardinality."""
+    return statement.lstrip().split(None, 1)[0].upper() if statement and statement.strip() else "?"
+
+
+# === LANGCHAIN CALLBACK ===
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Đo thời gian từng bước agent, LLM call (kèm token) và tool. Tạo mới cho mỗi request."""
+
+    def __init__(self):
+        self._starts = {}
+        self._models = {}
+        self._tools = {}
+        self._prompt_estimates = {}
+        self._step_start = time.perf_counter()
+        # Tổng hợp theo request (dùng cho benchmark/báo cáo)
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start_llm(serialized, run_id, kwargs, sum(count_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start_llm(serialized, run_id, kwargs, sum(count_message_tokens(m) for m in messages))
+
+    def _start_llm(self, serialized, run_id, kwargs, estimated_prompt_tokens):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "llm")
+        self._models[run_id] = str(model)
+        self._starts[run_id] = time.perf_counter()
+        self._prompt_estimates[run_id] = estimated_prompt_tokens
+        self.llm_calls += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model = self._models.pop(run_id, "llm")
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            observe("llm", model, time.perf_counter() - start)
+        estimated_prompt = self._prompt_estimates.pop(run_id, 0)
+        # Provider không trả usage (vd. langchain-google-genai 1.0.x) → dùng ước lượng
+        prompt_tokens, completion_tokens, _ = extract_token_usage(response)
+        prompt_tokens = prompt_tokens or estimated_prompt
+        completion_tokens = completion_tokens or count_tokens(completion_text(response))
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+        logger.info("llm model=%s prompt_tokens=%d completion_tokens=%d", model, prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompt_estimates.pop(run_id, None)
+        self._models.pop(run_id, None)
+        self._starts.pop(run_id, None)
+        logger.warning("llm error: %s", error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._tools[run_id] = (serialized or {}).get("name", "tool")
+        self._starts[run_id] = time.perf_counter()
+        logger.info("tool start name=%s input=%r", self._tools[run_id], input_str)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        name = self._tools.pop(run_id, "tool")
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            observe("tool", name, time.perf_counter() - start)
+        self._step_start = time.perf_counter()
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tools.pop(run_id, None)
+        self._starts.pop(run_id, None)
+        logger.warning("tool error: %s", error)
+
+    def on_agent_action(self, action, **kwargs):
+        # Thời gian "suy nghĩ" của agent: từ cuối bước trước tới khi chọn được action
+        observe("agent_step", action.tool, time.perf_counter() - self._step_start)
+        logger.info("agent action tool=%s", action.tool)
+
+    def on_agent_finish(self, finish, **kwargs):
+        observe("agent_step", "final_answer", time.perf_counter() - self._step_start)
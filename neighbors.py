@@ -0,0 +1,201 @@
+# neighbors.py
+"""Đồ thị láng giềng top-K tính trước (offline) cho gợi ý phim.
+
+Chạy sau load_data.py (catalog chỉ đổi khi loader chạy):
+    python neighbors.py --k 20 --memory-mb 1024 --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from monitoring import timed
+
+logger = logging.getLogger("movies_chatbot.neighbors")
+
+# === CẤU HÌNH ===
+NEIGHBORS_PATH = os.getenv("NEIGHBORS_PATH", "neighbors")  # thư mục chứa các file .npy
+NEIGHBORS_K = int(os.getenv("NEIGHBORS_K", "20"))
+# Bộ nhớ tạm tối đa cho các block đang chạy song song; block size = ngân sách / (workers × N × BYTES_PER_CELL)
+NEIGHBORS_MEMORY_MB = int(os.getenv("NEIGHBORS_MEMORY_MB", "1024"))
+NEIGHBORS_BLOCK_SIZE = int(os.getenv("NEIGHBORS_BLOCK_SIZE", "0"))  # > 0: ép block size (bỏ qua ngân sách)
+NEIGHBORS_WORKERS = int(os.getenv("NEIGHBORS_WORKERS", str(os.cpu_count() or 1)))
+CHROMA_PAGE_SIZE = 5000
+# Mỗi ô block × N của top_k_block: sims float32 (4 byte) + chỉ số int64 của argpartition (8 byte)
+BYTES_PER_CELL = 12
+
+FILES = ("ids", "neighbors", "scores")
+
+
+def fetch_overview_embeddings(collection, page_size=CHROMA_PAGE_SIZE):
+    """Đọc toàn bộ embedding overview từ Chroma → (movie_ids int64, ma trận float32 đã chuẩn hóa L2), theo
+    thứ tự của Chroma. Ghi từng trang thẳng vào ma trận cấp phát trước (không giữ list vector Python)."""
+    total = collection.count()
+    movie_ids = np.empty(total, dtype=np.int64)
+    matrix = None
+    offset = 0
+    while offset < total:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        vectors = vectors[:total - offset]  # collection lớn lên trong lúc đọc → bỏ phần dư
+        if matrix is None:
+            matrix = np.empty((total, vectors.shape[1]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        stop = offset + len(vectors)
+        matrix[offset:stop] = vectors
+        movie_ids[offset:stop] = [int(meta["movie_id"]) for meta in page["metadatas"][:len(vectors)]]
+        offset = stop
+    if matrix is None:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    return movie_ids[:offset], matrix[:offset]
+
+
+def top_k_block(matrix, start, stop, k):
+    """Cosine similarity của các hàng [start, stop) với toàn bộ ma trận → top-k (chỉ số int32, điểm), bỏ chính nó.
+    Bộ nhớ tạm ~ (stop - start) × N × BYTES_PER_CELL."""
+    sims = matrix[start:stop] @ matrix.T
+    sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+    top = np.argpartition(sims, -k, axis=1)[:, -k:].astype(np.int32)  # trên chính sims, không tạo bản -sims
+    top_scores = np.take_along_axis(sims, top, axis=1)
+    del sims
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def block_size_for(n, workers=NEIGHBORS_WORKERS, memory_mb=NEIGHBORS_MEMORY_MB):
+    """Số hàng mỗi block để workers block chạy song song nằm trong memory_mb."""
+    if NEIGHBORS_BLOCK_SIZE > 0:
+        return NEIGHBORS_BLOCK_SIZE
+    return max(1, memory_mb * 1024 * 1024 // (max(workers, 1) * max(n, 1) * BYTES_PER_CELL))
+
+
+def compute_neighbors(matrix, k=NEIGHBORS_K, block_size=None, workers=NEIGHBORS_WORKERS,
+                      memory_mb=NEIGHBORS_MEMORY_MB):
+    """Nhân ma trận theo block (giới hạn bộ nhớ), các block chạy song song (numpy nhả GIL khi matmul).
+    block_size mặc định suy từ NEIGHBORS_MEMORY_MB (block_size_for)."""
+    n = len(matrix)
+    k = min(k, n - 1)
+    block_size = block_size or block_size_for(n, workers, memory_mb)
+    neighbors = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    if k <= 0:
+        return neighbors, scores
+
+    def run(start):
+        stop = min(start + block_size, n)
+        neighbors[start:stop], scores[start:stop] = top_k_block(matrix, start, stop, k)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, range(0, n, block_size)))
+    return neighbors, scores
+
+
+def save_graph(path, movie_ids, neighbors, scores):
+    """Sắp xếp theo movie_id (tra cứu bằng searchsorted) rồi ghi file tạm + os.replace → tiến trình đang đọc
+    không thấy đồ thị ghi dở. Chỉ hoán vị kết quả n × k, không đụng tới ma trận embedding."""
+    os.makedirs(path, exist_ok=True)
+    order = np.argsort(movie_ids)
+    arrays = (movie_ids[order], movie_ids[neighbors[order]], scores[order])
+    for name, array in zip(FILES, arrays):
+        tmp = os.path.join(path, f"{name}.tmp.npy")
+        np.save(tmp, array)
+        os.replace(tmp, os.path.join(path, f"{name}.npy"))
+    meta = {"count": int(len(movie_ids)), "k": int(neighbors.shape[1]), "built_at": time.time()}
+    tmp = os.path.join(path, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))  # ghi cuối cùng: đánh dấu bản mới đã đủ
+
+
+def graph_path() -> str:
+    """Đồ thị đi kèm bản index Chroma đang active (chroma_index.py); bố cục cũ → NEIGHBORS_PATH."""
+    from config import chroma_index
+    return chroma_index.neighbors_path() or NEIGHBORS_PATH
+
+
+def build_neighbor_graph(path=None, k=NEIGHBORS_K, block_size=NEIGHBORS_BLOCK_SIZE,
+                         workers=NEIGHBORS_WORKERS, collection=None, memory_mb=NEIGHBORS_MEMORY_MB):
+    path = path or graph_path()
+    if collection is None:
+        from config import collection_overview as collection
+    start = time.perf_counter()
+    movie_ids, matrix = fetch_overview_embeddings(collection)
+    neighbors, scores = compute_neighbors(matrix, k, block_size, workers, memory_mb)
+    save_graph(path, movie_ids, neighbors, scores)
+    elapsed = time.perf_counter() - start
+    logger.info("neighbor graph built: %d movies, k=%d in %.1fs", len(movie_ids), neighbors.shape[1], elapsed)
+    return elapsed
+
+
+class NeighborGraph:
+    """Đồ thị đã tính, mở bằng memory map (không nạp hết vào RAM)."""
+
+    def __init__(self, path=NEIGHBORS_PATH):
+        self.path = path
+        self.mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.neighbors = np.load(os.path.join(path, "neighbors.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(path, "scores.npy"), mmap_mode="r")
+
+    def _row(self, movie_id: int):
+        i = int(np.searchsorted(self.ids, movie_id))
+        return i if i < len(self.ids) and self.ids[i] == movie_id else None
+
+    def __contains__(self, movie_id) -> bool:
+        return self._row(int(movie_id)) is not None
+
+    def recommend(self, liked_ids, n=10):
+        """Gộp danh sách láng giềng của các phim đã thích → {movie_id: similarity trung bình}, top n.
+        Phim không nằm trong danh sách của một phim đã thích được tính similarity 0 với phim đó."""
+        liked = {int(mid) for mid in liked_ids}
+        totals = {}
+        for mid in liked:
+            row = self._row(mid)
+            for neighbor, score in zip(self.neighbors[row].tolist(), self.scores[row].tolist()):
+                if neighbor not in liked:
+                    totals[neighbor] = totals.get(neighbor, 0.0) + score
+        ranked = sorted(totals.items(), key=lambda item: -item[1])[:n]
+        return {mid: total / len(liked) for mid, total in ranked}
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph(path=None):
+    """Đồ thị hiện tại, tự mở lại khi neighbors.py build bản mới hoặc index được swap; None nếu chưa build."""
+    global _graph
+    path = path or graph_path()
+    meta = os.path.join(path, "meta.json")
+    if not os.path.exists(meta):
+        return None
+    with _graph_lock:
+        if _graph is None or _graph.path != path or _graph.mtime != os.path.getmtime(meta):
+            with timed("neighbor_graph", "load"):
+                _graph = NeighborGraph(path)
+        return _graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính trước top-K phim tương tự cho mọi phim trong Chroma")
+    parser.add_argument("--path", help="Mặc định: thư mục neighbors/ của bản index đang active")
+    parser.add_argument("--k", type=int, default=NEIGHBORS_K)
+    parser.add_argument("--memory-mb", type=int, default=NEIGHBORS_MEMORY_MB,
+                        help="Bộ nhớ tạm tối đa cho các block chạy song song")
+    parser.add_argument("--block-size", type=int, default=NEIGHBORS_BLOCK_SIZE, help="0 = suy từ --memory-mb")
+    parser.add_argument("--workers", type=int, default=NEIGHBORS_WORKERS)
+    args = parser.parse_args()
+
+    elapsed = build_neighbor_graph(args.path, args.k, args.block_size, args.workers, memory_mb=args.memory_mb)
+    print(f"✅ Đã tính đồ thị láng giềng trong {elapsed:.1f}s → {args.path or graph_path()}")
+
+
+if __name__ == "__main__":
+    main()
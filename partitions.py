@@ -0,0 +1,316 @@
+# partitions.py
+"""Chia collection Chroma theo khóa (ngôn ngữ, thập kỷ, hash) để index toàn bộ catalog.
+
+Tên collection con: <base>__<key>_<value>, vd. movie_overviews__decade_1990, movie_overviews__hash_07.
+Không chia (CHROMA_PARTITION_KEY=none, hoặc dữ liệu cũ) → một collection tên <base> như trước.
+Sơ đồ chia suy ra từ tên collection nên mỗi bản index (chroma_index.py) tự mang sơ đồ của nó;
+CHROMA_PARTITION_KEY chỉ dùng khi build bản mới.
+
+Query gửi song song tới các partition còn lại sau khi lọc theo `where` (language, release_year),
+rồi gộp top-k bằng heap theo khoảng cách.
+"""
+import heapq
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# === CẤU HÌNH ===
+CHROMA_PARTITION_KEY = os.getenv("CHROMA_PARTITION_KEY", "none")  # none | language | decade | hash
+CHROMA_HASH_PARTITIONS = int(os.getenv("CHROMA_HASH_PARTITIONS", "16"))
+CHROMA_QUERY_WORKERS = int(os.getenv("CHROMA_QUERY_WORKERS", "8"))  # số partition truy vấn đồng thời
+# ef lúc tìm của HNSW (mặc định Chroma = 10): gộp top-k từ nhiều partition cần mỗi partition trả đúng hơn
+CHROMA_HNSW_SEARCH_EF = int(os.getenv("CHROMA_HNSW_SEARCH_EF", "50"))
+
+PARTITION_KEYS = ("none", "language", "decade", "hash")
+SEPARATOR = "__"
+RESULT_FIELDS = ("ids", "embeddings", "metadatas", "documents", "distances")
+
+if CHROMA_PARTITION_KEY not in PARTITION_KEYS:
+    raise ValueError(f"CHROMA_PARTITION_KEY phải là một trong {PARTITION_KEYS}")
+
+_pool = ThreadPoolExecutor(max_workers=CHROMA_QUERY_WORKERS, thread_name_prefix="chroma-fanout")
+
+
+def normalize_language(language) -> str:
+    """Mã ngôn ngữ dùng cho metadata và tên partition ("xx" = không rõ, như TMDB)."""
+    return re.sub(r"[^a-z0-9]", "", (language or "").lower()) or "xx"
+
+
+def partition_metadata(language, release_date) -> dict:
+    """Trường metadata dùng để chia partition và lọc (release_year = 0 khi không rõ ngày)."""
+    return {"language": normalize_language(language), "release_year": release_date.year if release_date else 0}
+
+
+def partition_value(key: str, metadata: dict) -> str:
+    if key == "language":
+        return metadata["language"]
+    if key == "decade":
+        return f"{metadata['release_year'] // 10 * 10:04d}"  # 0000 = không rõ năm
+    if key == "hash":
+        # id phim TMDB tăng dần, phân bố đều → chia lấy dư đủ cân bằng
+        return f"{int(metadata['movie_id']) % CHROMA_HASH_PARTITIONS:02d}"
+    return ""
+
+
+def partition_name(base: str, key: str, value: str) -> str:
+    return base if key == "none" else f"{base}{SEPARATOR}{key}_{value}"
+
+
+def parse_partition_name(name: str):
+    """Tên collection → (base, key, value); collection không chia → (name, "none", "")."""
+    base, sep, suffix = name.partition(SEPARATOR)
+    if sep:
+        key, _, value = suffix.partition("_")
+        if key in PARTITION_KEYS:
+            return base, key, value
+    return name, "none", ""
+
+
+def metadata_where(language=None, year_from=None, year_to=None):
+    """Bộ lọc `where` của Chroma theo ngôn ngữ/năm (None nếu không lọc); cũng là đầu vào để loại partition."""
+    conditions = []
+    if language:
+        conditions.append({"language": normalize_language(language)})
+    if year_from:
+        conditions.append({"release_year": {"$gte": int(year_from)}})
+    if year_to:
+        conditions.append({"release_year": {"$lte": int(year_to)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _language_values(value):
+    if isinstance(value, str):
+        return {normalize_language(value)}
+    if isinstance(value, dict) and set(value) == {"$eq"}:
+        return {normalize_language(value["$eq"])}
+    if isinstance(value, dict) and set(value) == {"$in"}:
+        return {normalize_language(v) for v in value["$in"]}
+    return None
+
+
+def _year_bounds(value):
+    ops = value if isinstance(value, dict) else {"$eq": value}
+    if not ops or not set(ops) <= {"$gte", "$gt", "$lte", "$lt", "$eq"}:
+        return None
+    low, high = None, None
+    for op, year in ops.items():
+        if op in ("$gte", "$gt", "$eq"):
+            low = max(low or 0, year + (op == "$gt"))
+        if op in ("$lte", "$lt", "$eq"):
+            high = min(high if high is not None else year, year - (op == "$lt"))
+    return low, high
+
+
+def _conditions(where):
+    """Các điều kiện AND ở mức trên cùng, mỗi điều kiện một trường."""
+    if not where:
+        return []
+    return where["$and"] if set(where) == {"$and"} else [{field: value} for field, value in where.items()]
+
+
+def where_constraints(where):
+    """Đọc điều kiện AND ở mức trên cùng của `where` → (tập ngôn ngữ hoặc None, năm nhỏ nhất, năm lớn nhất).
+    Điều kiện khác ($or, $ne, ...) bỏ qua → không loại partition nào, kết quả vẫn đúng."""
+    languages, low, high = None, None, None
+    for condition in _conditions(where):
+        for field, value in condition.items():
+            if field == "language" and _language_values(value) is not None:
+                values = _language_values(value)
+                languages = values if languages is None else languages & values
+            elif field == "release_year" and _year_bounds(value) is not None:
+                cond_low, cond_high = _year_bounds(value)
+                if cond_low is not None:
+                    low = max(low or 0, cond_low)
+                if cond_high is not None:
+                    high = cond_high if high is None else min(high, cond_high)
+    return languages, low, high
+
+
+class PartitionedCollection:
+    """Nhóm các collection con cùng base, dùng như một Collection (add/get/query/delete/count)."""
+
+    def __init__(self, client, base: str, key: str, parts: dict, frozen: bool = False):
+        self.client = client
+        self.name = base
+        self.key = key
+        self.parts = parts  # value → Collection
+        # frozen: bản index đã build xong (versions/<id>/) không đổi → cache danh sách partition và số phần tử.
+        # Bố cục cũ thì load_to_chroma ghi thẳng vào collection đang phục vụ (có thể từ tiến trình khác),
+        # nên mỗi lần đọc phải tìm lại partition và đếm lại.
+        self.frozen = frozen
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    # --- ghi ---
+    def _part(self, value: str):
+        with self._lock:
+            if value not in self.parts:
+                name = partition_name(self.name, self.key, value)
+                self.parts[value] = self.client.get_or_create_collection(
+                    name, metadata={"hnsw:search_ef": CHROMA_HNSW_SEARCH_EF})
+            self._sizes.pop(value, None)
+            return self.parts[value]
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Chia từng bản ghi vào partition theo metadata (movie_id, language, release_year)."""
+        groups = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(partition_value(self.key, meta), []).append(i)
+        for value, rows in groups.items():
+            self._part(value).add(
+                ids=[ids[i] for i in rows],
+                documents=[documents[i] for i in rows] if documents is not None else None,
+                metadatas=[metadatas[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows] if embeddings is not None else None,
+            )
+
+    def delete(self, ids=None, where=None):
+        self._discover()
+        for value in list(self.parts):
+            part = self._part(value)
+            # Chỉ xóa id có trong partition (Chroma cảnh báo từng id không tồn tại)
+            found = part.get(ids=ids, where=where, include=[])["ids"]
+            if found:
+                part.delete(ids=found)
+
+    # --- đọc ---
+    def _discover(self):
+        """Thêm partition do nơi khác tạo sau khi mở (chỉ khi chưa frozen)."""
+        if self.frozen:
+            return
+        found, found_key = find_partitions(self.client, self.name)
+        with self._lock:
+            if found_key and not self.parts:
+                self.key = found_key  # mở lúc còn rỗng, sơ đồ do bên ghi quyết định
+            for value, coll in found.items():
+                self.parts.setdefault(value, coll)
+
+    def _size(self, value: str) -> int:
+        if not self.frozen:
+            return self.parts[value].count()
+        if value not in self._sizes:
+            self._sizes[value] = self.parts[value].count()
+        return self._sizes[value]
+
+    def count(self) -> int:
+        self._discover()
+        return sum(self._size(value) for value in list(self.parts))
+
+    def select(self, where=None):
+        """Các partition có thể chứa kết quả thỏa `where` (loại trước khi truy vấn)."""
+        self._discover()
+        languages, low, high = where_constraints(where)
+        selected = []
+        for value in sorted(self.parts):
+            if self.key == "language" and languages is not None and value not in languages:
+                continue
+            if self.key == "decade" and value.isdigit():
+                decade = int(value)
+                if (low is not None and decade + 9 < low) or (high is not None and decade > high):
+                    continue
+            if self._size(value):
+                selected.append(value)
+        return selected
+
+    def residual_where(self, where, value: str):
+        """Bỏ các điều kiện mà mọi phần tử của partition đã thỏa (vd. language=en trên partition "en"):
+        Chroma lọc metadata chậm hơn nhiều so với HNSW thuần, nên partition khớp trọn vẹn được truy vấn không lọc."""
+        languages, low, high = where_constraints(where)
+        implied = set()
+        if self.key == "language" and languages is not None and value in languages:
+            implied.add("language")
+        if self.key == "decade" and value.isdigit() and (low is not None or high is not None):
+            decade = int(value)
+            if (low is None or decade >= low) and (high is None or decade + 9 <= high):
+                implied.add("release_year")
+        if not implied:
+            return where
+        parsers = {"language": _language_values, "release_year": _year_bounds}
+        remaining = [
+            condition for condition in _conditions(where)
+            if not all(field in implied and parsers[field](v) is not None for field, v in condition.items())
+        ]
+        if not remaining:
+            return None
+        return remaining[0] if len(remaining) == 1 else {"$and": remaining}
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        include = list(include)  # Chroma chỉ nhận list
+        parts = [self.parts[value] for value in self.select(where)]
+        if len(parts) == 1:
+            return parts[0].get(ids=ids, where=where, limit=limit, offset=offset, include=include)
+        if limit is None and not offset:
+            pages = list(_pool.map(lambda part: part.get(ids=ids, where=where, include=include), parts))
+        elif ids is None and where is None:
+            # Phân trang nối tiếp qua các partition theo thứ tự tên (vd. neighbors.py đọc toàn bộ embedding)
+            pages, skip, remaining = [], offset or 0, limit
+            for part in parts:
+                size = part.count()  # đếm lại: partition có thể đang được ghi (load_data.py)
+                if skip >= size:
+                    skip -= size
+                    continue
+                page = part.get(limit=remaining, offset=skip, include=include)
+                pages.append(page)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(page["ids"])
+                    if remaining <= 0:
+                        break
+        else:
+            raise ValueError("limit/offset cùng ids/where chưa hỗ trợ trên collection đã chia partition")
+        merged = {"ids": [], "included": list(include)}
+        for field in RESULT_FIELDS[1:4]:
+            merged[field] = [] if field in include else None
+        for page in pages:
+            for field in ("ids",) + tuple(f for f in RESULT_FIELDS[1:4] if f in include):
+                merged[field].extend(page[field])
+        return merged
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")):
+        include = list(include)
+        values = self.select(where)
+        if len(values) == 1:
+            return self.parts[values[0]].query(query_embeddings=query_embeddings, include=include,
+                                               where=self.residual_where(where, values[0]),
+                                               n_results=min(n_results, self._size(values[0])))
+        fetch = list(dict.fromkeys(list(include) + ["distances"]))  # cần khoảng cách để gộp
+
+        def run(value):
+            return self.parts[value].query(query_embeddings=query_embeddings, include=fetch,
+                                           where=self.residual_where(where, value),
+                                           n_results=min(n_results, self._size(value)))
+
+        results = list(_pool.map(run, values))
+        merged = {"included": list(include), "ids": []}
+        for field in RESULT_FIELDS[1:]:
+            merged[field] = [] if field in include else None
+        for q in range(len(query_embeddings)):
+            # Mỗi partition đã trả kết quả sắp theo khoảng cách → heap merge, chỉ lấy n_results đầu
+            streams = [[(dist, p, j) for j, dist in enumerate(res["distances"][q])]
+                       for p, res in enumerate(results)]
+            top = list(islice(heapq.merge(*streams), n_results))
+            merged["ids"].append([results[p]["ids"][q][j] for _, p, j in top])
+            for field in RESULT_FIELDS[1:]:
+                if field in include:
+                    merged[field].append([results[p][field][q][j] for _, p, j in top])
+        return merged
+
+
+def find_partitions(client, base: str):
+    """Các collection con đã có của `base` → ({value: Collection}, sơ đồ chia hoặc None nếu chưa có)."""
+    parts, found_key = {}, None
+    for coll in client.list_collections():
+        coll_base, coll_key, value = parse_partition_name(coll.name)
+        if coll_base == base:
+            parts[value], found_key = coll, coll_key
+    return parts, found_key
+
+
+def open_partitioned(client, base: str, key: str = None, frozen: bool = False) -> PartitionedCollection:
+    """Gom các collection con đã có của `base`; chưa có gì → sơ đồ `key` (mặc định CHROMA_PARTITION_KEY) khi ghi."""
+    parts, found_key = find_partitions(client, base)
+    return PartitionedCollection(client, base, found_key or key or CHROMA_PARTITION_KEY, parts, frozen=frozen)
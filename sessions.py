@@ -0,0 +1,184 @@
+# sessions.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict, replace
+from typing import Dict, List, Optional, Tuple
+
+from token_budget import count_tokens
+
+# === CẤU HÌNH SESSION ===
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory" hoặc "sqlite"
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(50 * 1024 * 1024)))  # trần bộ nhớ toàn cục
+SESSION_MAX_TOOL_RESULTS = int(os.getenv("SESSION_MAX_TOOL_RESULTS", "20"))  # mỗi session
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+BATCH_MAX_TOOL_RESULTS = int(os.getenv("BATCH_MAX_TOOL_RESULTS", "5000"))  # cache tool dùng chung của một batch
+
+# Cache kết quả tool của request hiện tại (của session, hoặc dùng chung trong một batch)
+tool_cache_var: ContextVar[Optional[Dict[str, str]]] = ContextVar("tool_cache", default=None)
+
+
+@dataclass
+class Session:
+    session_id: str
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (câu hỏi, câu trả lời)
+    summary: str = ""  # tóm tắt cuốn chiếu các lượt cũ
+    tool_cache: Dict[str, str] = field(default_factory=dict)  # "tool::input" → observation
+    updated_at: float = field(default_factory=time.time)
+
+    def size_bytes(self) -> int:
+        size = len(self.summary.encode("utf-8"))
+        size += sum(len(q.encode("utf-8")) + len(a.encode("utf-8")) for q, a in self.turns)
+        size += sum(len(k.encode("utf-8")) + len(v.encode("utf-8")) for k, v in self.tool_cache.items())
+        return size
+
+    def copy(self) -> "Session":
+        """Bản riêng cho một request: thay đổi (lượt mới, cache tool) chỉ vào store khi save()."""
+        return replace(self, turns=list(self.turns), tool_cache=dict(self.tool_cache))
+
+    def history_tokens(self) -> int:
+        return count_tokens(self.summary) + sum(count_tokens(q) + count_tokens(a) for q, a in self.turns)
+
+    def render_history(self) -> str:
+        """Lịch sử đưa vào prompt: tóm tắt + các lượt gần nhất."""
+        lines = []
+        if self.summary:
+            lines.append(f"Tóm tắt trước đó: {self.summary}")
+        for q, a in self.turns:
+            lines.append(f"Người dùng: {q}")
+            lines.append(f"Trợ lý: {a}")
+        return "\n".join(lines) or "(chưa có)"
+
+
+def trim_history(session: Session, summarize_fn, budget: int = HISTORY_TOKEN_BUDGET):
+    """Gộp các lượt cũ nhất vào summary cho tới khi lịch sử nằm trong ngân sách token.
+    Luôn giữ nguyên văn lượt gần nhất."""
+    if session.history_tokens() <= budget or len(session.turns) <= 1:
+        return
+    old = []
+    while len(session.turns) > 1 and session.history_tokens() > budget:
+        old.append(session.turns.pop(0))
+    session.summary = summarize_fn(session.summary, old)
+
+
+class SharedToolCache(dict):
+    """Cache tool dùng chung giữa các câu hỏi chạy song song của một batch (batch.py).
+    Khóa theo từng key: câu hỏi thứ hai cùng tool + input chờ kết quả của câu đầu thay vì gọi lại."""
+
+    max_items = BATCH_MAX_TOOL_RESULTS
+
+    def __init__(self):
+        super().__init__()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def key_lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+def remember_tool_result(cache: Dict[str, str], key: str, observation: str):
+    cache.pop(key, None)
+    cache[key] = observation
+    # dict giữ thứ tự chèn → phần tử đầu là cũ nhất
+    while len(cache) > getattr(cache, "max_items", SESSION_MAX_TOOL_RESULTS):
+        cache.pop(next(iter(cache)))
+
+
+class InMemorySessionStore:
+    """LRU + TTL, giới hạn cả số session lẫn tổng dung lượng."""
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, ttl=SESSION_TTL_SECONDS, max_bytes=SESSION_MAX_BYTES):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl:
+                self._remove(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+            # Trả bản sao: cache tool thêm trong request được tính vào max_bytes khi save()
+            return session.copy()
+
+    def save(self, session: Session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._remove(session.session_id)
+            size = session.size_bytes()
+            self._sessions[session.session_id] = session
+            self._sizes[session.session_id] = size
+            self._total_bytes += size
+            while self._sessions and (len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes):
+                self._remove(next(iter(self._sessions)))
+
+    def _remove(self, session_id: str):
+        if self._sessions.pop(session_id, None) is not None:
+            self._total_bytes -= self._sizes.pop(session_id)
+
+
+class SQLiteSessionStore:
+    """Lưu session xuống SQLite (dùng chung giữa nhiều worker, sống qua restart)."""
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=SESSION_MAX_SESSIONS, ttl=SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT, updated_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at)")
+            self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated_at > ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        if not row:
+            return None
+        data = json.loads(row[0])
+        data["turns"] = [tuple(t) for t in data["turns"]]
+        return Session(**data)
+
+    def save(self, session: Session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(asdict(session), ensure_ascii=False), session.updated_at),
+            )
+            # Dọn session hết hạn và session cũ nhất vượt quá giới hạn
+            self._conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (time.time() - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM sessions WHERE id NOT IN (SELECT id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+                (self.max_sessions,),
+            )
+            self._conn.commit()
+
+
+def create_session_store():
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore()
+    return InMemorySessionStore()
+
+
+session_store = create_session_store()
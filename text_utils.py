@@ -0,0 +1,16 @@
+# text_utils.py
+import re
+import unicodedata
+
+_TOKEN = re.compile(r"\w+")
+
+
+def fold_accents(text: str) -> str:
+    """Bỏ dấu + chữ thường (giống unaccent của PostgreSQL): "Đạo diễn" → "dao dien"."""
+    text = (text or "").replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str):
+    return _TOKEN.findall(fold_accents(text))
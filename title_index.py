@@ -0,0 +1,423 @@
+# title_index.py
+"""Gợi ý tên phim khi gõ (autocomplete) từ index trong RAM trên tên đã bỏ dấu (text_utils.fold_accents).
+
+- Tiền tố: mảng khóa đã sắp xếp (tên, tên gốc, tên bỏ mạo từ "the"/"la"/...) + bisect. Tiền tố khớp
+  quá PREFIX_SCAN_LIMIT khóa ("t", "th"...) dùng top phim theo popularity tính sẵn.
+- Gõ sai: trigram giống pg_trgm → độ tương đồng Jaccard, chỉ chạy khi tiền tố không đủ kết quả.
+
+Snapshot (gzip JSON) được nạp khi app khởi động; phim crawl thêm (id > max_id) được bổ sung mỗi
+TITLE_INDEX_REFRESH_SECONDS. Build lại snapshot (cập nhật popularity) sau mỗi lần import:
+    python title_index.py
+"""
+import argparse
+import bisect
+import gzip
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+
+import numpy as np
+from sqlalchemy import text
+
+from monitoring import timed
+from text_utils import fold_accents
+
+logger = logging.getLogger("movies_chatbot.title_index")
+
+# === CẤU HÌNH ===
+TITLE_INDEX_PATH = os.getenv("TITLE_INDEX_PATH", "title_index.json.gz")
+TITLE_INDEX_MIN_VOTES = int(os.getenv("TITLE_INDEX_MIN_VOTES", "10"))  # 0 = toàn bộ catalog (~1M tên)
+TITLE_INDEX_REFRESH_SECONDS = float(os.getenv("TITLE_INDEX_REFRESH_SECONDS", "60"))  # kiểm tra phim mới crawl
+TITLE_MIN_SIMILARITY = float(os.getenv("TITLE_MIN_SIMILARITY", "0.3"))  # như pg_trgm.similarity_threshold
+AUTOCOMPLETE_LIMIT = 10
+PREFIX_SCAN_LIMIT = 256  # tiền tố khớp nhiều khóa hơn → dùng top tính sẵn thay vì quét
+PREFIX_TOP_K = 20  # số phim giữ cho mỗi tiền tố phổ biến (≥ limit tối đa của API)
+FUZZY_MAX_CANDIDATES = 5000  # tổng độ dài posting tối đa dùng sinh ứng viên trigram
+FUZZY_SHORTLIST_AFTER = 6  # sau chừng này trigram phổ biến chỉ đếm tiếp cho FUZZY_SHORTLIST ứng viên
+FUZZY_SHORTLIST = 300
+SNAPSHOT_VERSION = 1
+
+TITLES_SQL = text("""
+    SELECT id, title, original_title, release_date, popularity
+    FROM movies
+    WHERE title IS NOT NULL
+      AND (:min_votes <= 0 OR vote_count >= :min_votes)
+      AND id > :after_id
+    ORDER BY id
+""")
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Mạo từ đầu tên (đã bỏ dấu): "dark knight" vẫn khớp "The Dark Knight"
+ARTICLES = ("the ", "a ", "an ", "le ", "la ", "les ", "l ", "el ", "los ", "las ", "il ", "der ", "die ", "das ")
+
+
+def normalize_title(title: str) -> str:
+    """Bỏ dấu, chữ thường, dấu câu → khoảng trắng: "Spider-Man: Far From Home" → "spider man far from home"."""
+    title = title or ""
+    folded = title.lower() if title.isascii() else fold_accents(title)  # phần lớn tên là ASCII
+    return _NON_WORD.sub(" ", folded).strip()
+
+
+def title_keys(norms) -> set:
+    """Các khóa tiền tố của một phim từ tên đã chuẩn hóa: tên, tên gốc và bản bỏ mạo từ đầu."""
+    keys = set(norms)
+    for norm in norms:
+        for article in ARTICLES:
+            if norm.startswith(article) and len(norm) > len(article):
+                keys.add(norm[len(article):])
+    return keys
+
+
+def trigrams(norm: str) -> set:
+    """Trigram như pg_trgm: mỗi từ được đệm "  " đầu và " " cuối."""
+    grams = set()
+    for word in norm.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    """Index tên phim. Mỗi phim là một "entry" (chỉ số trong các mảng cột); chỉ thêm, không xóa."""
+
+    def __init__(self, rows=(), max_id=0):
+        self.ids, self.titles, self.original_titles, self.years = [], [], [], []
+        self.popularity = array("f")
+        self.keys, self.key_entries = [], []  # khóa đã sắp xếp + entry tương ứng
+        self.docs = array("i")  # doc trigram → entry (mỗi phim 1–2 doc: tên, tên gốc)
+        self.doc_sizes = array("H")  # số trigram của mỗi doc
+        self.postings = {}  # trigram → array doc
+        self.top = {}  # tiền tố phổ biến → [entry] theo popularity giảm dần
+        self.max_id = max_id
+        self._lock = threading.Lock()  # search đọc dưới lock; add chỉ giữ lock để append cột và swap tham chiếu
+        self._write_lock = threading.Lock()  # mỗi lúc một lần add
+
+        pairs = []
+        for row in rows:
+            entry, norms = self._append(row)
+            pairs.extend((key, entry) for key in title_keys(norms))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.key_entries = [entry for _, entry in pairs]
+        self._precompute_top()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _append(self, row):
+        """Thêm cột + trigram của một phim (id, title, original_title, year, popularity) → (entry, tên đã chuẩn hóa)."""
+        movie_id, title, original_title, year, popularity = row
+        entry = len(self.ids)
+        self.ids.append(movie_id)
+        self.titles.append(title)
+        self.original_titles.append(original_title if original_title != title else None)
+        self.years.append(year)
+        self.popularity.append(popularity or 0.0)
+        self.max_id = max(self.max_id, movie_id)
+        norms = {normalize_title(title), normalize_title(original_title)} - {""}
+        for norm in norms:
+            grams = trigrams(norm)
+            doc = len(self.docs)
+            self.docs.append(entry)
+            self.doc_sizes.append(min(len(grams), 65535))
+            for gram in grams:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("i")
+                posting.append(doc)
+        return entry, norms
+
+    def _ranked(self, entries, k):
+        """Top k entry (không trùng) theo popularity giảm dần."""
+        return heapq.nlargest(k, set(entries), key=self.popularity.__getitem__)
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self.keys, prefix)
+        return lo, bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo)
+
+    def _precompute_top(self):
+        """Duyệt các tiền tố có quá PREFIX_SCAN_LIMIT khóa (từ ngắn đến dài, nhảy theo bisect) → top sẵn."""
+        pending = [""]
+        while pending:
+            prefix = pending.pop()
+            lo, hi = self._range(prefix)
+            if hi - lo <= PREFIX_SCAN_LIMIT:
+                continue
+            if prefix:
+                self.top[prefix] = self._ranked(self.key_entries[lo:hi], PREFIX_TOP_K)
+            i = lo
+            while i < hi:  # mỗi ký tự tiếp theo là một tiền tố con
+                if len(self.keys[i]) == len(prefix):
+                    i += 1
+                    continue
+                child = self.keys[i][:len(prefix) + 1]
+                pending.append(child)
+                i = self._range(child)[1]
+
+    def add(self, rows):
+        """Bổ sung phim mới (sau crawl) mà không build lại. Mảng khóa đã sắp xếp và top tính sẵn được dựng lại
+        ngoài lock rồi swap tham chiếu: search chỉ phải chờ phần append cột (tỉ lệ với số phim mới)."""
+        with self._write_lock:
+            pairs = []
+            with self._lock:
+                for row in rows:
+                    entry, norms = self._append(row)
+                    pairs.extend((key, entry) for key in title_keys(norms))
+            pairs.sort()
+            keys, key_entries = self._merged_keys(pairs)
+            top = self._merged_top(pairs)
+            with self._lock:
+                self.keys, self.key_entries, self.top = keys, key_entries, top
+
+    def _merged_keys(self, pairs):
+        """Gộp các cặp (khóa, entry) mới đã sắp xếp vào bản sao mảng khóa (nối slice, không insert từng phần tử)."""
+        keys, key_entries, start = [], [], 0
+        for key, entry in pairs:
+            pos = bisect.bisect_right(self.keys, key, start)
+            keys += self.keys[start:pos]
+            key_entries += self.key_entries[start:pos]
+            keys.append(key)
+            key_entries.append(entry)
+            start = pos
+        keys += self.keys[start:]
+        key_entries += self.key_entries[start:]
+        return keys, key_entries
+
+    def _merged_top(self, pairs):
+        """Bản sao top tính sẵn có thêm phim mới (tiền tố vừa vượt ngưỡng được prefix_matches tính lười)."""
+        added = {}
+        for key, entry in pairs:
+            for end in range(1, len(key) + 1):
+                if key[:end] in self.top:
+                    added.setdefault(key[:end], set()).add(entry)
+        top = dict(self.top)
+        for prefix, entries in added.items():
+            top[prefix] = self._ranked(top[prefix] + list(entries), PREFIX_TOP_K)
+        return top
+
+    def prefix_matches(self, norm, limit):
+        lo, hi = self._range(norm)
+        if hi - lo > PREFIX_SCAN_LIMIT:
+            top = self.top.get(norm)
+            if top is None:  # tiền tố vừa vượt ngưỡng nhờ phim mới thêm → tính một lần rồi giữ lại
+                top = self.top[norm] = self._ranked(self.key_entries[lo:hi], PREFIX_TOP_K)
+            return top[:limit]
+        return self._ranked(self.key_entries[lo:hi], limit)
+
+    def fuzzy_matches(self, norm, limit, exclude=()):
+        """Entry có độ tương đồng trigram ≥ TITLE_MIN_SIMILARITY → [(entry, similarity)],
+        xếp theo độ tương đồng rồi popularity."""
+        grams = trigrams(norm)
+        postings = sorted((np.frombuffer(self.postings.get(g, array("i")), dtype=np.int32) for g in grams), key=len)
+        # similarity ≥ ngưỡng ⇒ chung ít nhất `need` trigram ⇒ chứa ít nhất một trong len - need + 1 trigram
+        # hiếm nhất → ứng viên lấy từ các posting ngắn, posting dài (trigram phổ biến) chỉ dùng để đếm.
+        # Giới hạn thêm FUZZY_MAX_CANDIDATES: bỏ sót phim chỉ chung trigram phổ biến (đổi lấy latency)
+        need = max(1, int(np.ceil(TITLE_MIN_SIMILARITY * len(grams))))
+        postings = [p for p in postings if len(p)]
+        split, total = 0, 0
+        while split < len(postings) - need + 1:
+            total += len(postings[split])
+            if split and total > FUZZY_MAX_CANDIDATES:
+                break
+            split += 1
+        rare, common = postings[:split], postings[split:]
+        if not rare:
+            return []
+        docs, shared = np.unique(np.concatenate(rare), return_counts=True)
+        for i, posting in enumerate(common):  # posting luôn tăng dần theo doc (chỉ append) → searchsorted
+            if i == FUZZY_SHORTLIST_AFTER and len(docs) > FUZZY_SHORTLIST:
+                # Tên dài: giữ các ứng viên chung nhiều trigram hiếm nhất, phần còn lại chỉ đếm cho chúng
+                top = np.argpartition(-shared, FUZZY_SHORTLIST)[:FUZZY_SHORTLIST]
+                top.sort()
+                docs, shared = docs[top], shared[top]
+            pos = np.minimum(np.searchsorted(posting, docs), len(posting) - 1)
+            shared += posting[pos] == docs
+        sizes = np.frombuffer(self.doc_sizes, dtype=np.uint16)[docs]
+        similarity = shared / (len(grams) + sizes - shared)
+        keep = np.flatnonzero(similarity >= TITLE_MIN_SIMILARITY)
+        # Sắp xếp bằng numpy, Python chỉ duyệt phần đầu (mỗi phim tối đa 2 doc + phim đã có ở tiền tố)
+        entries = np.frombuffer(self.docs, dtype=np.int32)[docs[keep]]
+        popularity = np.frombuffer(self.popularity, dtype=np.float32)[entries]
+        order = keep[np.lexsort((-popularity, -similarity[keep]))]
+        best = {}
+        for doc, sim in zip(docs[order].tolist(), similarity[order].tolist()):
+            entry = self.docs[doc]
+            if entry not in exclude and entry not in best:
+                best[entry] = sim
+                if len(best) == limit:
+                    break
+        return list(best.items())
+
+    def search(self, query: str, limit=AUTOCOMPLETE_LIMIT):
+        """Gợi ý theo tiền tố trước (popularity giảm dần), thiếu thì bổ sung bằng trigram."""
+        norm = normalize_title(query)
+        if not norm:
+            return []
+        with self._lock:
+            with timed("autocomplete", "prefix"):
+                entries = self.prefix_matches(norm, limit)
+            results = [self._result(entry, "prefix", None) for entry in entries]
+            if len(results) < limit:
+                with timed("autocomplete", "fuzzy"):
+                    fuzzy = self.fuzzy_matches(norm, limit - len(results), exclude=set(entries))
+                results.extend(self._result(entry, "fuzzy", sim) for entry, sim in fuzzy)
+        return results
+
+    def _result(self, entry, match, similarity):
+        return {
+            "id": self.ids[entry],
+            "title": self.titles[entry],
+            "original_title": self.original_titles[entry],
+            "year": self.years[entry],
+            "popularity": round(float(self.popularity[entry]), 3),
+            "match": match,
+            "similarity": round(similarity, 3) if similarity is not None else None,
+        }
+
+
+# === SNAPSHOT ===
+def fetch_titles(db, after_id=0, min_votes=TITLE_INDEX_MIN_VOTES):
+    """Đọc (id, title, original_title, year, popularity) từ PostgreSQL theo thứ tự id."""
+    result = db.execute(TITLES_SQL, {"min_votes": min_votes, "after_id": after_id},
+                        execution_options={"stream_results": True})
+    return [
+        (r.id, r.title, r.original_title, r.release_date.year if r.release_date else None, r.popularity)
+        for r in result
+    ]
+
+
+def build_snapshot(path=TITLE_INDEX_PATH, min_votes=TITLE_INDEX_MIN_VOTES) -> int:
+    """Ghi snapshot dạng cột (gzip JSON) qua file tạm + os.replace → app đang chạy không đọc phải file ghi dở."""
+    from config import SessionLocal
+    db = SessionLocal()
+    try:
+        rows = fetch_titles(db, min_votes=min_votes)
+    finally:
+        db.close()
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "built_at": time.time(),
+        "min_votes": min_votes,
+        "max_id": max((r[0] for r in rows), default=0),
+        "columns": [list(column) for column in zip(*rows)] if rows else [[]] * 5,
+    }
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def load_snapshot(path=TITLE_INDEX_PATH) -> TitleIndex:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot {path} không đúng định dạng (version={snapshot.get('version')})")
+    return TitleIndex(zip(*snapshot["columns"]), snapshot["max_id"])
+
+
+# === INDEX DÙNG CHUNG ===
+_state = {"index": None, "mtime": None, "checked_at": 0.0, "refreshing": False}
+_state_lock = threading.Lock()
+_load_lock = threading.Lock()  # nạp lần đầu (có thể build snapshot từ DB)
+
+
+def _snapshot_mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def _load(path):
+    if _snapshot_mtime(path) is None:
+        count = build_snapshot(path)
+        logger.info("title index snapshot built: %d titles → %s", count, path)
+    mtime = _snapshot_mtime(path)
+    with timed("autocomplete", "load"):
+        return load_snapshot(path), mtime
+
+
+def get_index(path=TITLE_INDEX_PATH) -> TitleIndex:
+    """Index hiện tại; lần đầu nạp snapshot (tự build từ DB nếu chưa có). Sau đó chỉ cập nhật ở nền."""
+    index = _state["index"]
+    if index is None:
+        # Chỉ một thread nạp, request khác chờ cùng kết quả; _state_lock không bị giữ trong lúc đọc DB/file
+        with _load_lock:
+            index = _state["index"]
+            if index is None:
+                index, mtime = _load(path)
+                with _state_lock:
+                    _state.update(index=index, mtime=mtime, checked_at=time.time())
+    maybe_refresh(path)
+    return index
+
+
+def maybe_refresh(path=TITLE_INDEX_PATH):
+    """Tối đa mỗi TITLE_INDEX_REFRESH_SECONDS, ở thread nền (request autocomplete không chờ DB/nạp lại):
+    snapshot mới (title_index.py vừa chạy) → nạp rồi swap; không thì thêm phim có id > max_id (crawler
+    thêm id mới)."""
+    with _state_lock:
+        now = time.time()
+        if _state["refreshing"] or now - _state["checked_at"] < TITLE_INDEX_REFRESH_SECONDS:
+            return
+        _state.update(refreshing=True, checked_at=now)
+
+    def run():
+        from config import SessionLocal
+        try:
+            if _snapshot_mtime(path) != _state["mtime"]:
+                index, mtime = _load(path)
+                with _state_lock:
+                    _state.update(index=index, mtime=mtime)
+            index = _state["index"]
+            db = SessionLocal()
+            try:
+                rows = fetch_titles(db, after_id=index.max_id)
+            finally:
+                db.close()
+            if rows:
+                index.add(rows)
+                logger.info("title index refreshed: +%d titles", len(rows))
+        except Exception:
+            logger.exception("title index refresh failed")
+        finally:
+            _state["refreshing"] = False
+
+    threading.Thread(target=run, name="title-index-refresh", daemon=True).start()
+
+
+def autocomplete(query: str, limit=AUTOCOMPLETE_LIMIT):
+    return get_index().search(query, limit)
+
+
+def resolve_title(title: str):
+    """Phim gần nhất với tên người dùng gõ (có thể sai chính tả) → dict như autocomplete, None nếu không có."""
+    results = autocomplete(title, limit=1)
+    return results[0] if results else None
+
+
+def warm_index():
+    """Nạp index khi app khởi động (chạy ở thread nền); lỗi chỉ ghi log, request sau sẽ thử lại."""
+    try:
+        index = get_index()
+        logger.info("title index ready: %d titles, max_id=%d", len(index), index.max_id)
+    except Exception:
+        logger.exception("title index load failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build snapshot index tên phim cho autocomplete")
+    parser.add_argument("--path", default=TITLE_INDEX_PATH)
+    parser.add_argument("--min-votes", type=int, default=TITLE_INDEX_MIN_VOTES)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = build_snapshot(args.path, args.min_votes)
+    print(f"✅ Đã ghi {count} tên phim vào {args.path} trong {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
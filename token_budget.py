@@ -0,0 +1,147 @@
+# token_budget.py
+import logging
+import os
+import re
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("movies_chatbot.tokens")
+
+# === CẤU HÌNH ===
+REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "20000"))  # prompt + completion mỗi request
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))  # ước lượng khi provider không trả usage
+COMPACT_TOOL_OUTPUT = os.getenv("COMPACT_TOOL_OUTPUT", "1") == "1"
+MAX_OBSERVATION_TOKENS = int(os.getenv("MAX_OBSERVATION_TOKENS", "300"))
+
+
+class TokenBudgetExceeded(Exception):
+    pass
+
+
+def count_tokens(text: str) -> int:
+    """Ước lượng số token (không gọi API count_tokens để tránh thêm một round trip)."""
+    return int(len(text or "") / CHARS_PER_TOKEN) + 1
+
+
+def count_message_tokens(messages) -> int:
+    return sum(count_tokens(str(m.content)) for m in messages)
+
+
+def extract_token_usage(response):
+    """Lấy (prompt_tokens, completion_tokens, cached_tokens) từ LLMResult, tùy provider trả về dạng nào.
+    Trả về 0 cho phần provider không báo."""
+    llm_output = response.llm_output or {}
+    usage = llm_output.get("token_usage") or llm_output.get("usage_metadata")
+    if not usage:
+        for gens in response.generations:
+            for gen in gens:
+                message = getattr(gen, "message", None)
+                usage = getattr(message, "usage_metadata", None) or (gen.generation_info or {}).get("usage_metadata")
+                if usage:
+                    break
+            if usage:
+                break
+    if not usage:
+        return 0, 0, 0
+    prompt = usage.get("input_tokens") or usage.get("prompt_tokens") or usage.get("prompt_token_count") or 0
+    completion = (
+        usage.get("output_tokens") or usage.get("completion_tokens")
+        or usage.get("candidates_token_count") or 0
+    )
+    cached = usage.get("cached_content_token_count") or usage.get("cache_read_input_tokens") or 0
+    return int(prompt), int(completion), int(cached)
+
+
+def completion_text(response) -> str:
+    parts = []
+    for gens in response.generations:
+        for gen in gens:
+            message = getattr(gen, "message", None)
+            parts.append(gen.text or "")
+            if message is not None and getattr(message, "tool_calls", None):
+                parts.append(str(message.tool_calls))
+    return "".join(parts)
+
+
+# === RÚT GỌN OBSERVATION ===
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_FLOAT_INT = re.compile(r"\b(\d+)\.0\b")
+_RATING = re.compile(r"\s*[–-]\s*([\d.]+) điểm đánh giá và (\d+) lượt đánh giá")
+
+
+def compact_observation(text: str, max_tokens: int = MAX_OBSERVATION_TOKENS) -> str:
+    """Chuyển output Markdown của tool thành dạng gọn trước khi vào scratchpad:
+    bỏ tiêu đề, bỏ định dạng, gộp danh sách thành 1 dòng ngăn cách bởi '; ', cắt theo ngân sách token."""
+    if not COMPACT_TOOL_OUTPUT or not text:
+        return text
+    items = []
+    for line in str(text).splitlines():
+        line = line.strip()
+        if not line or (line.endswith(":") and not line.startswith("-")):
+            continue  # tiêu đề kiểu "Gợi ý cho bạn:"
+        line = _FLOAT_INT.sub(r"\1", _BOLD.sub(r"\1", line.lstrip("-• ").strip()))
+        items.append(_RATING.sub(r" ★\1/\2", line))
+    compact = "; ".join(items)
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(compact) > max_chars:
+        compact = compact[:max_chars].rsplit(";", 1)[0] + "; …"
+    return compact
+
+
+# === NGÂN SÁCH TOKEN THEO REQUEST ===
+class TokenBudgetHandler(BaseCallbackHandler):
+    """Đếm token prompt/completion từng bước LLM của một request và chặn khi vượt ngân sách."""
+
+    raise_error = True  # để TokenBudgetExceeded dừng agent thay vì bị nuốt
+
+    def __init__(self, budget: int = REQUEST_TOKEN_BUDGET):
+        self.budget = budget
+        self.steps = []  # [{"prompt_tokens", "completion_tokens", "cached_tokens"}]
+        self._pending = {}
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(s["prompt_tokens"] for s in self.steps)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(s["completion_tokens"] for s in self.steps)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def _check(self, run_id, prompt_tokens):
+        self._pending[run_id] = prompt_tokens
+        if self.total_tokens + prompt_tokens > self.budget:
+            raise TokenBudgetExceeded(
+                f"Vượt ngân sách {self.budget} token (đã dùng {self.total_tokens}, bước tiếp cần {prompt_tokens})"
+            )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._check(run_id, sum(count_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._check(run_id, sum(count_message_tokens(m) for m in messages))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        estimated_prompt = self._pending.pop(run_id, 0)
+        prompt_tokens, completion_tokens, cached_tokens = extract_token_usage(response)
+        step = {
+            "prompt_tokens": prompt_tokens or estimated_prompt,
+            "completion_tokens": completion_tokens or count_tokens(completion_text(response)),
+            "cached_tokens": cached_tokens,
+        }
+        self.steps.append(step)
+        logger.debug("llm step=%d %s", len(self.steps), step)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._pending.pop(run_id, None)
+
+    def usage(self) -> dict:
+        return {
+            "llm_calls": len(self.steps),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": sum(s["cached_tokens"] for s in self.steps),
+        }
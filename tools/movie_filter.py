@@ -0,0 +1,128 @@
+# tools/movie_filter.py
+from datetime import date
+
+from langchain.tools import tool
+from config import SessionLocal
+from sqlalchemy import text
+from text_utils import fold_accents
+from tools.people_search import person_condition
+
+PAGE_SIZE = 5
+MAX_PAGE = 10
+
+# Thể loại TMDB (dạng chữ thường như trong genres_arr, database/array_columns.py)
+TMDB_GENRES = {
+    "action", "adventure", "animation", "comedy", "crime", "documentary", "drama", "family",
+    "fantasy", "history", "horror", "music", "mystery", "romance", "science fiction",
+    "tv movie", "thriller", "war", "western",
+}
+
+# Tên tiếng Việt (đã bỏ dấu) → thể loại TMDB
+GENRE_ALIASES = {
+    "hanh dong": "action", "phieu luu": "adventure", "hoat hinh": "animation", "hai": "comedy",
+    "hai huoc": "comedy", "hinh su": "crime", "toi pham": "crime", "tai lieu": "documentary",
+    "tam ly": "drama", "chinh kich": "drama", "gia dinh": "family", "gia tuong": "fantasy",
+    "lich su": "history", "kinh di": "horror", "am nhac": "music", "bi an": "mystery",
+    "trinh tham": "mystery", "lang man": "romance", "tinh cam": "romance",
+    "khoa hoc vien tuong": "science fiction", "vien tuong": "science fiction", "sci-fi": "science fiction",
+    "giat gan": "thriller", "chien tranh": "war", "cao boi": "western",
+}
+
+LANGUAGE_ALIASES = {
+    "tieng viet": "vietnamese", "tieng anh": "english", "tieng han": "korean", "tieng nhat": "japanese",
+    "tieng phap": "french", "tieng trung": "mandarin", "tieng tay ban nha": "spanish",
+}
+
+
+def normalize_genre(name: str):
+    """ "Hành động" / "hanh dong" / "Action" → "action"; None nếu không phải thể loại đã biết."""
+    folded = fold_accents(name.strip())
+    genre = GENRE_ALIASES.get(folded, folded)
+    return genre if genre in TMDB_GENRES else None
+
+
+def parse_filters(query: str) -> dict:
+    """ "genre=hành động; year_from=2015; person=Nolan; page=2" → dict bộ lọc."""
+    filters = {}
+    for part in query.split(";"):
+        key, sep, value = part.partition("=")
+        key, value = key.strip().lower(), value.strip()
+        if sep and value:
+            filters[key] = value
+    return filters
+
+
+def build_filter_sql(filters: dict):
+    """Ghép điều kiện WHERE dùng index: @> trên cột text[] (GIN), people_tsv (GIN), release_date (btree)."""
+    conditions, params, unknown = [], {}, []
+
+    genres = [normalize_genre(g) for g in filters.get("genre", "").split(",") if g.strip()]
+    if None in genres:
+        unknown.append(filters["genre"])
+    if genres and None not in genres:
+        conditions.append("genres_arr @> CAST(:genres AS text[])")
+        params["genres"] = genres
+    if filters.get("company"):
+        conditions.append("companies_arr @> CAST(:companies AS text[])")
+        params["companies"] = [c.strip().lower() for c in filters["company"].split(",") if c.strip()]
+    if filters.get("language"):
+        language = fold_accents(filters["language"])
+        conditions.append("languages_arr @> CAST(:languages AS text[])")
+        params["languages"] = [LANGUAGE_ALIASES.get(language, language)]
+    person = person_condition(filters.get("person", ""))
+    if person:
+        conditions.append(person)
+        params["person"] = filters["person"].strip()
+    if filters.get("year_from", "").isdigit():
+        conditions.append("release_date >= :date_from")
+        params["date_from"] = date(int(filters["year_from"]), 1, 1)
+    if filters.get("year_to", "").isdigit():
+        conditions.append("release_date < :date_to")
+        params["date_to"] = date(int(filters["year_to"]) + 1, 1, 1)
+
+    sql = f"""
+        SELECT title, release_date, vote_average, vote_count
+        FROM movies
+        WHERE {" AND ".join(conditions) or "TRUE"}
+        ORDER BY popularity DESC NULLS LAST
+        LIMIT :limit OFFSET :offset
+    """
+    return sql, params, conditions, unknown
+
+
+@tool
+def filter_movies(query: str) -> str:
+    """Lọc phim theo nhiều tiêu chí cùng lúc, xếp theo độ phổ biến.
+    Input: các cặp key=value ngăn cách bởi ";", gồm genre (vd. hành động, có thể nhiều: "hài, gia đình"),
+    year_from, year_to, person (đạo diễn/diễn viên), company (tên hãng chính xác), language, page.
+    Ví dụ: "genre=hành động; year_from=2015; person=Christopher Nolan"."""
+    filters = parse_filters(query)
+    sql, params, conditions, unknown = build_filter_sql(filters)
+    if unknown:
+        return f"Không rõ thể loại: {', '.join(unknown)}."
+    if not conditions:
+        return "Vui lòng cung cấp ít nhất một tiêu chí lọc (genre, year_from, year_to, person, company, language)."
+
+    page = min(max(int(filters["page"]), 1), MAX_PAGE) if filters.get("page", "").isdigit() else 1
+    params.update({"limit": PAGE_SIZE + 1, "offset": (page - 1) * PAGE_SIZE})
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(text(sql), params).fetchall()
+    except Exception as e:
+        return f"Lỗi lọc phim: {str(e)}"
+    finally:
+        db.close()
+
+    if not rows:
+        return "Không tìm thấy phim nào khớp các tiêu chí."
+
+    lines = []
+    for title, release_date, vote_average, vote_count in rows[:PAGE_SIZE]:
+        year = release_date.strftime("%Y") if release_date else "N/A"
+        lines.append(f"- **{title}** ({year}) – {vote_average} điểm đánh giá và {vote_count} lượt đánh giá")
+    result = f"Phim phù hợp (trang {page}):\n" + "\n".join(lines)
+    if len(rows) > PAGE_SIZE and page < MAX_PAGE:
+        rest = "; ".join(f"{key}={value}" for key, value in filters.items() if key != "page")
+        result += f"\nCòn nữa: dùng \"{rest}; page={page + 1}\""
+    return result
@@ -0,0 +1,94 @@
+# tools/people_search.py
+from langchain.tools import tool
+from config import SessionLocal
+from sqlalchemy import text
+from text_utils import fold_accents, tokenize
+
+PAGE_SIZE = 5
+MAX_PAGE = 10  # trần cứng: tối đa PAGE_SIZE * MAX_PAGE phim cho một người
+
+# Trọng số trong people_tsv (database/people_index.py)
+ROLE_WEIGHTS = {"director": "A", "cast": "B", "crew": "C"}
+ROLE_LABELS = {"director": "Đạo diễn", "cast": "Diễn viên", "crew": "Biên kịch/Ekip"}
+
+# Tên người → phraseto_tsquery với cùng parser 'simple' + f_unaccent như khi tạo people_tsv: tên có gạch nối
+# ("Park Chan-wook" → 'park':1 'chan-wook':2 'chan':3 'wook':4) khớp đúng vị trí từ ở hai phía
+PERSON_TSQUERY = "phraseto_tsquery('simple', f_unaccent(:person))"
+
+PEOPLE_SEARCH_SQL = """
+    SELECT title, release_date, director, "cast", writers
+    FROM movies
+    WHERE {condition}
+    ORDER BY popularity DESC NULLS LAST
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def parse_person_query(query: str):
+    """ "Christopher Nolan; role=director; page=2" → (tên, role, page)"""
+    name, role, page = "", None, 1
+    for part in query.split(";"):
+        key, sep, value = part.partition("=")
+        key, value = key.strip().lower(), value.strip().lower()
+        if sep and key == "role" and value in ROLE_WEIGHTS:
+            role = value
+        elif sep and key == "page" and value.isdigit():
+            page = min(max(int(value), 1), MAX_PAGE)
+        elif not sep:
+            name = part.strip()
+    return name, role, page
+
+
+def person_condition(name: str, role: str = None):
+    """Điều kiện WHERE (tham số :person) khớp cả cụm tên liền nhau; có role thì chỉ xét phần people_tsv
+    mang trọng số của vai trò đó (ts_filter). None nếu tên rỗng."""
+    if not tokenize(name):
+        return None
+    # people_tsv @@ ... dùng GIN index, ts_filter chỉ kiểm tra lại trên các dòng đã khớp
+    condition = f"people_tsv @@ {PERSON_TSQUERY}"
+    if role:
+        condition += f""" AND ts_filter(people_tsv, '{{{ROLE_WEIGHTS[role]}}}'::"char"[]) @@ {PERSON_TSQUERY}"""
+    return condition
+
+
+def detect_role(name: str, director, cast, writers) -> str:
+    folded = fold_accents(name)
+    if director and folded in fold_accents(director):
+        return ROLE_LABELS["director"]
+    if cast and folded in fold_accents(cast):
+        return ROLE_LABELS["cast"]
+    return ROLE_LABELS["crew"]
+
+
+@tool
+def find_movies_by_person(query: str) -> str:
+    """Tìm phim theo đạo diễn, diễn viên hoặc biên kịch (filmography), xếp theo độ phổ biến.
+    Input: tên người, tùy chọn thêm "; role=director|cast|crew" và "; page=2" để xem tiếp."""
+    name, role, page = parse_person_query(query)
+    condition = person_condition(name, role)
+    if not condition:
+        return "Vui lòng cung cấp tên đạo diễn hoặc diễn viên."
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            text(PEOPLE_SEARCH_SQL.format(condition=condition)),
+            {"person": name, "limit": PAGE_SIZE + 1, "offset": (page - 1) * PAGE_SIZE}
+        ).fetchall()
+    except Exception as e:
+        return f"Lỗi tìm kiếm: {str(e)}"
+    finally:
+        db.close()
+
+    if not rows:
+        return f"Không tìm thấy phim nào của {name}."
+
+    lines = []
+    for title, date, director, cast, writers in rows[:PAGE_SIZE]:
+        year = date.strftime("%Y") if date else "N/A"
+        lines.append(f"- **{title}** ({year}) – {detect_role(name, director, cast, writers)}")
+    result = f"Phim của {name} (trang {page}):\n" + "\n".join(lines)
+    if len(rows) > PAGE_SIZE and page < MAX_PAGE:
+        role_part = f"; role={role}" if role else ""
+        result += f"\nCòn nữa: dùng \"{name}{role_part}; page={page + 1}\""
+    return result
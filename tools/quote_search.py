@@ -1,37 +1,58 @@
 # tools/quote_search.py
 from langchain.tools import tool
 from config import collection_quotes, embedding_fn, SessionLocal
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from monitoring import timed
+from partitions import metadata_where
+
+MOVIES_BY_IDS_SQL = text(
+    "SELECT id, title, release_date FROM movies WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def search_quote(quote: str, n: int = 3, language=None, year_from=None, year_to=None):
+    """Các phim có câu thoại gần nhất, xếp theo khoảng cách (dùng chung cho tool và /api/search/quote).
+    Lọc ngôn ngữ/năm tùy chọn: partition không thể khớp bị loại trước khi truy vấn."""
+    # Dùng cùng encoder với lúc load (embedding mặc định của Chroma lệch số chiều)
+    query_embedding = embedding_fn(quote)
+    with timed("chroma_query", "movie_quotes"):
+        results = collection_quotes.query(
+            query_embeddings=[query_embedding],
+            n_results=n,
+            where=metadata_where(language, year_from, year_to),
+            include=["metadatas", "distances"]
+        )
+    if not results["ids"][0]:
+        return []
+
+    distances = {
+        int(meta["movie_id"]): dist
+        for meta, dist in zip(results["metadatas"][0], results["distances"][0])
+    }
+    db = SessionLocal()
+    try:
+        movies = db.execute(MOVIES_BY_IDS_SQL, {"ids": list(distances)}).fetchall()
+    finally:
+        db.close()
+    matches = [
+        {"id": movie.id, "title": movie.title, "release_date": movie.release_date,
+         "distance": round(distances[movie.id], 4)}
+        for movie in movies
+    ]
+    return sorted(matches, key=lambda m: m["distance"])
+
 
 @tool
 def find_movie_by_quote(quote: str) -> str:
     """Tìm phim theo câu thoại bằng semantic search trong ChromaDB."""
     try:
-        results = collection_quotes.query(
-            query_texts=[quote],
-            n_results=3,  # Lấy 3 → chọn phim tốt nhất
-            include=["metadatas", "distances"]
-        )
-        
-        if not results["ids"][0]:
+        # Lấy 3 → chọn phim tốt nhất
+        matches = search_quote(quote, n=3)
+        if not matches:
             return "Không tìm thấy phim nào với câu thoại này."
-        
-        # Chọn kết quả gần nhất
-        best = min(zip(results["metadatas"][0], results["distances"][0]), key=lambda x: x[1])
-        movie_id = best[0]["movie_id"]
-        
-        db = SessionLocal()
-        movie = db.execute(
-            text("SELECT title, release_date FROM movies WHERE id = :mid"),
-            {"mid": int(movie_id)}
-        ).fetchone()
-        db.close()
-        
-        if movie:
-            title, date = movie
-            year = date.strftime("%Y") if date else "N/A"
-            return f"**{title}** ({year})"
-        else:
-            return "Tìm thấy quote nhưng không có thông tin phim."
+
+        best = matches[0]
+        year = best["release_date"].strftime("%Y") if best["release_date"] else "N/A"
+        return f"**{best['title']}** ({year})"
     except Exception as e:
-        return f"Lỗi tìm kiếm: {str(e)}"
\ No newline at end of file
+        return f"Lỗi tìm kiếm: {str(e)}"
@@ -1,8 +1,111 @@
 # tools/recommend.py
+import logging
+
 from langchain.tools import tool
 from config import collection, embedding_fn
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 import numpy as np
+from monitoring import timed
+from neighbors import get_graph
+from title_index import resolve_title
+
+logger = logging.getLogger("movies_chatbot.recommend")
+
+N_CANDIDATES = 10  # lấy dư ứng viên từ Chroma rồi xếp lại theo thể loại
+GENRE_BOOST = 0.1  # trừ vào khoảng cách theo tỉ lệ thể loại trùng với phim đã thích
+
+MOVIES_BY_IDS_SQL = text(
+    "SELECT id, title, release_date, genres FROM movies WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def genre_set(genres) -> set:
+    return {g.strip().lower() for g in (genres or "").split(",") if g.strip()}
+
+
+def graph_candidates(liked_ids, n=N_CANDIDATES):
+    """Gộp danh sách láng giềng tính trước (neighbors.py); None nếu chưa build hoặc có phim chưa nằm trong đồ thị."""
+    graph = get_graph()
+    if graph is None or not all(int(mid) in graph for mid in liked_ids):
+        return None
+    with timed("neighbor_graph", "lookup"):
+        similarities = graph.recommend(liked_ids, n)
+    # cosine distance trung bình tới các phim đã thích (0..2, nhỏ hơn = giống hơn), như live_candidates
+    return {mid: 1.0 - sim for mid, sim in similarities.items()}
+
+
+def unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def live_candidates(liked_ids, n=N_CANDIDATES):
+    """ANN trực tiếp trên Chroma quanh vector trung bình (phim chưa có trong đồ thị tính trước)."""
+    # Lấy vector trung bình từ Chroma
+    vectors = []
+    for mid in liked_ids:
+        with timed("chroma_query", "movie_overviews.get"):
+            res = collection.get(ids=[f"overview_{mid}"], include=["embeddings"])
+        if res["embeddings"]:
+            vectors.append(res["embeddings"][0])
+    
+    if not vectors:
+        return "Không có dữ liệu mô tả (overview) cho phim bạn thích."
+
+    centroid = np.mean(vectors, axis=0).tolist()
+    
+    # Tìm phim tương tự (loại trừ phim đã thích)
+    with timed("chroma_query", "movie_overviews"):
+        results = collection.query(
+            query_embeddings=[centroid],
+            n_results=n,
+            where={"movie_id": {"$nin": liked_ids}},
+            include=["metadatas", "embeddings"],
+        )
+    
+    if not results["metadatas"] or not results["metadatas"][0]:
+        return "Không tìm thấy gợi ý tương tự."
+
+    # Khoảng cách của Chroma là L2 bình phương (mặc định), khác thang với graph_candidates → tính lại
+    # cosine distance trung bình tới từng phim đã thích, cùng định nghĩa với đồ thị tính trước (GENRE_BOOST,
+    # "score" của /api/similar không phụ thuộc phim có trong đồ thị hay không)
+    similarities = (unit_rows(results["embeddings"][0]) @ unit_rows(vectors).T).mean(axis=1)
+    return {
+        int(meta["movie_id"]): 1.0 - float(sim)
+        for meta, sim in zip(results["metadatas"][0], similarities)
+    }
+
+
+def similar_movies(liked_ids, liked_genres=frozenset(), n=3):
+    """Top n phim tương tự (dùng chung cho tool và /api/similar): đồ thị tính trước, fallback ANN,
+    rồi xếp lại theo thể loại. Trả về danh sách dict, hoặc chuỗi thông báo lỗi."""
+    n_candidates = max(N_CANDIDATES, 2 * n)
+    distances = graph_candidates(liked_ids, n_candidates)
+    if distances is None:
+        distances = live_candidates(liked_ids, n_candidates)
+        if isinstance(distances, str):
+            return distances
+    if not distances:
+        return []
+
+    from config import SessionLocal
+    db = SessionLocal()
+    try:
+        # Một truy vấn theo khóa chính cho tất cả ứng viên thay vì mỗi phim một query
+        movies = db.execute(MOVIES_BY_IDS_SQL, {"ids": list(distances)}).fetchall()
+    finally:
+        db.close()
+
+    def score(movie):
+        overlap = len(genre_set(movie.genres) & liked_genres) / len(liked_genres) if liked_genres else 0
+        return distances[movie.id] - GENRE_BOOST * overlap
+
+    return [
+        {"id": movie.id, "title": movie.title, "release_date": movie.release_date, "score": round(score(movie), 4)}
+        for movie in sorted(movies, key=score)[:n]
+    ]
+
 
 @tool
 def recommend_movie_from_likes(liked_titles: str) -> str:
@@ -12,58 +115,46 @@ def recommend_movie_from_likes(liked_titles: str) -> str:
         return "Vui lòng cung cấp ít nhất 1 tên phim bạn thích."
 
     liked_ids = []
+    liked_genres = set()
+    corrections = []
     from config import SessionLocal
     db = SessionLocal()
     try:
         for title in titles:
             result = db.execute(
-                text("SELECT id FROM movies WHERE title ILIKE :t"),
+                text("SELECT id, genres FROM movies WHERE LOWER(title) LIKE LOWER(:t)"),
                 {"t": f"%{title}%"}
             ).fetchone()
+            if not result:
+                # Gõ sai/thiếu dấu → lấy tên gần nhất từ index autocomplete thay vì để agent thử lại
+                try:
+                    match = resolve_title(title)
+                except Exception:  # lần đầu có thể phải build snapshot / đọc DB → lỗi coi như không khớp
+                    logger.exception("resolve_title failed for %r", title)
+                    match = None
+                if match:
+                    result = db.execute(text("SELECT id, genres FROM movies WHERE id = :id"),
+                                        {"id": match["id"]}).fetchone()
+                    corrections.append(f'"{title}" → {match["title"]}')
             if result:
                 liked_ids.append(str(result[0]))
+                liked_genres |= genre_set(result[1])
     finally:
         db.close()
     
     if not liked_ids:
         return "Không tìm thấy phim nào bạn thích trong hệ thống."
 
-    # Lấy vector trung bình từ Chroma
-    vectors = []
-    for mid in liked_ids:
-        res = collection.get(ids=[f"overview_{mid}"], include=["embeddings"])
-        if res["embeddings"]:
-            vectors.append(res["embeddings"][0])
-    
-    if not vectors:
-        return "Không có dữ liệu mô tả (overview) cho phim bạn thích."
-
-    centroid = np.mean(vectors, axis=0).tolist()
-    
-    # Tìm phim tương tự (loại trừ phim đã thích)
-    results = collection.query(
-        query_embeddings=[centroid],
-        n_results=6,
-        where={"movie_id": {"$nin": liked_ids}}
-    )
-    
-    if not results["metadatas"]:
+    movies = similar_movies(liked_ids, liked_genres)
+    if isinstance(movies, str):
+        return movies  # thông báo lỗi
+    if not movies:
         return "Không tìm thấy gợi ý tương tự."
 
     recs = []
-    db = SessionLocal()
-    try:
-        for meta in results["metadatas"][:3]:
-            mid = meta["movie_id"]
-            movie = db.execute(
-                text("SELECT title, release_date FROM movies WHERE id = :mid"),
-                {"mid": int(mid)}
-            ).fetchone()
-            if movie:
-                title, date = movie
-                year = date.strftime("%Y") if date else "N/A"
-                recs.append(f"- **{title}** ({year})")
-    finally:
-        db.close()
+    for movie in movies:
+        year = movie["release_date"].strftime("%Y") if movie["release_date"] else "N/A"
+        recs.append(f"- **{movie['title']}** ({year})")
     
-    return "Gợi ý cho bạn:\n" + "\n".join(recs)
\ No newline at end of file
+    note = f"(Đã hiểu: {'; '.join(corrections)})\n" if corrections else ""
+    return note + "Gợi ý cho bạn:\n" + "\n".join(recs)
@@ -2,33 +2,57 @@
 from langchain.tools import tool
 from config import engine
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
+from tools.movie_filter import normalize_genre
 
 SessionLocal = sessionmaker(bind=engine)
 
-@tool
-def get_trending_movies(dummy: str = "") -> str:
-    """Lấy top 5 phim đang hot theo số lượt đánh giá (vote_count)."""
+TRENDING_SQL = """
+    SELECT id, title, release_date, vote_average, vote_count
+    FROM movies
+    WHERE vote_average > 8.0 AND vote_count > 1000 {genre_filter}
+    ORDER BY vote_average DESC, vote_count DESC
+    LIMIT :limit
+"""
+
+def fetch_trending(genre: str = "", limit: int = 5):
+    """Phim hot dạng dữ liệu thô (dùng chung cho tool và /api/trending).
+    Trả về (thể loại đã chuẩn hóa hoặc None, danh sách dict)."""
+    genre_name = normalize_genre(genre) if genre and genre.strip() else None
+    # Thể loại lạ (hoặc input thừa từ agent) → bỏ qua bộ lọc thay vì trả về rỗng
+    genre_filter = "AND genres_arr @> CAST(:genres AS text[])" if genre_name else ""
+    params = {"limit": limit}
+    if genre_name:
+        params["genres"] = [genre_name]
+
     db = SessionLocal()
     try:
-        result = db.execute(
-            text("""
-                SELECT title, release_date, vote_average, vote_count
-                FROM movies
-                WHERE vote_average > 8.0 AND vote_count > 1000
-                ORDER BY vote_average DESC, vote_count DESC
-                LIMIT 5
-            """)
-        ).fetchall()
-        
-        if not result:
-            return "Không có dữ liệu phim hot."
-        
-        trending = []
-        for title, date, vote_average, vote_count in result:
-            year = date.strftime("%Y") if date else "N/A"
-            trending.append(f"- **{title}** ({year}) – {vote_average} điểm đánh giá và {vote_count} lượt đánh giá")
-        
-        return "Top 5 phim đang hot (theo điểm đánh giá và lượt đánh giá):\n" + "\n".join(trending)
+        rows = db.execute(text(TRENDING_SQL.format(genre_filter=genre_filter)), params).fetchall()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+    return genre_name, [row._asdict() for row in rows]
+
+
+@tool
+def get_trending_movies(genre: str = "") -> str:
+    """Lấy top 5 phim đang hot theo số lượt đánh giá (vote_count).
+    Input (tùy chọn): thể loại, vd. "hành động", "kinh dị", "Animation"; để trống nếu không lọc."""
+    try:
+        genre_name, movies = fetch_trending(genre)
+    except SQLAlchemyError as e:  # vd. backend không có cột mảng genres_arr (SQLite)
+        return f"Lỗi lấy phim hot: {str(e)}"
+
+    if not movies:
+        return "Không có dữ liệu phim hot."
+
+    trending = []
+    for movie in movies:
+        date = movie["release_date"]
+        year = date.strftime("%Y") if date else "N/A"
+        trending.append(
+            f"- **{movie['title']}** ({year}) – {movie['vote_average']} điểm đánh giá và {movie['vote_count']} lượt đánh giá"
+        )
+
+    header = f"Top 5 phim {genre.strip()} đang hot" if genre_name else "Top 5 phim đang hot"
+    return header + " (theo điểm đánh giá và lượt đánh giá):\n" + "\n".join(trending)